@@ -1,7 +1,8 @@
 import bpy
 import os
 import json
-import subprocess
+import argparse
+import shutil
 import sys
 
 # Handle both file execution and text editor execution
@@ -11,26 +12,62 @@ except NameError:
 	# When run from Blender's text editor or console, __file__ doesn't exist
 	SCRIPT_DIR = os.path.dirname(os.path.abspath(bpy.data.filepath))
 
-# Ensure the script directory is in Python path
-if SCRIPT_DIR not in sys.path:
-	sys.path.insert(0, SCRIPT_DIR)
+PROCESSING_DIR = os.path.join(os.path.dirname(SCRIPT_DIR), "processing")
+
+# Ensure the script directory (and the stdlib-only processing helpers) are in Python path
+for path in (SCRIPT_DIR, PROCESSING_DIR):
+	if path not in sys.path:
+		sys.path.insert(0, path)
 
 # Try to import, if it fails, load manually
 try:
-	from finger_config import FINGERS, SHARED_COLLECTIONS, CAMERA_NAME, DITHER_CONFIG
+	from finger_config import FINGERS, SHARED_COLLECTIONS, CAMERA_NAME, DITHER_CONFIG, SAMPLING_CONFIG
 except ModuleNotFoundError:
 	print("Warning: Could not import finger_config, loading manually...")
 	config_path = os.path.join(SCRIPT_DIR, "finger_config.py")
 	with open(config_path, 'r') as f:
 		exec(f.read(), globals())
 
+from adaptive_sampling import sample_poses
+from build_cache import BuildCache, build_key
+from dither_worker import DitherWorker
+import tracing
+
 #-----Configuration-----#
 BASE_OUTPUT_DIR = "//../output"
+AXIS_INDEX = {"x": 0, "y": 1, "z": 2}
+PROBE_DIR = ".probes"    # under output/, outside raw/: adaptive sampling renders wait here for their frame number
 
 # All top-level finger collection names, derived from config
 FINGER_COLLECTIONS = [cfg["collection"] for cfg in FINGERS.values()]
 
 #-----Helpers-----#
+def parse_script_args():
+	"""Parse script arguments given after '--' on the Blender command line"""
+	argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+	parser = argparse.ArgumentParser(prog="export_all_fingers.py")
+	parser.add_argument("--force", action="store_true", help="Ignore build caches and redo all work")
+	parser.add_argument("--fingers", default=None,
+		help="Comma-separated subset of FINGERS to export (default: all)")
+	parser.add_argument("--summary", default=None,
+		help="Summary JSON path (default: output/export_summary.json)")
+	parser.add_argument("--batch-render", action="store_true",
+		help="Keyframe each finger's poses and render them with one animation render instead of one still per pose")
+	parser.add_argument("--no-dither", action="store_true",
+		help="Only render; leave dithering to the caller (run_pipeline.py --in-memory)")
+	args = parser.parse_args(argv)
+
+	if args.fingers is None:
+		args.fingers = list(FINGERS.keys())
+	else:
+		args.fingers = [name for name in args.fingers.split(",") if name]
+		unknown = [name for name in args.fingers if name not in FINGERS]
+		if unknown:
+			parser.error(f"Unknown fingers {unknown}. Available: {list(FINGERS.keys())}")
+
+	return args
+
 def lerp(a, b, t):
 	return a + (b - a) * t
 
@@ -49,12 +86,82 @@ def set_active_collection(target_collection_name):
 		if name in SHARED_COLLECTIONS:
 			continue
 
-		# Hide all finger collections except the active one
+		# Hide all finger collections except the active one. Only touch the ones
+		# that change: every exclude write triggers a depsgraph rebuild
 		if name in FINGER_COLLECTIONS:
-			layer_collection.exclude = (name != target_collection_name)
+			exclude = (name != target_collection_name)
+			if layer_collection.exclude != exclude:
+				layer_collection.exclude = exclude
 
 	print(f"  Active collection: {target_collection_name}")
 
+def matrix_to_list(matrix):
+	return [list(row) for row in matrix]
+
+def render_settings_fingerprint(scene):
+	"""Render settings that change the pixels of a still"""
+	render = scene.render
+	view = scene.view_settings
+	return {
+		"engine":                render.engine,
+		"resolution":            [render.resolution_x, render.resolution_y, render.resolution_percentage],
+		"pixel_aspect":          [render.pixel_aspect_x, render.pixel_aspect_y],
+		"film_transparent":      render.film_transparent,
+		"file_format":           render.image_settings.file_format,
+		"color_mode":            render.image_settings.color_mode,
+		"color_depth":           render.image_settings.color_depth,
+		"view_transform":        view.view_transform,
+		"look":                  view.look,
+		"exposure":              view.exposure,
+		"gamma":                 view.gamma,
+	}
+
+def collection_fingerprint(collection_name):
+	"""Cheap description of every object in a collection: transforms, data and modifiers"""
+	collection = bpy.data.collections.get(collection_name)
+	if collection is None:
+		return None
+
+	objects = []
+	for obj in sorted(collection.all_objects, key=lambda o: o.name):
+		entry = {
+			"name":        obj.name,
+			"type":        obj.type,
+			"matrix":      matrix_to_list(obj.matrix_world),
+			"data":        obj.data.name if obj.data else None,
+			"hide_render": obj.hide_render,
+			"modifiers":   [[m.name, m.type] for m in getattr(obj, "modifiers", [])],
+			"materials":   [slot.material.name if slot.material else None for slot in obj.material_slots],
+		}
+		if obj.type == 'MESH':
+			entry["mesh"] = [len(obj.data.vertices), len(obj.data.polygons)]
+		elif obj.type == 'LIGHT':
+			entry["light"] = [obj.data.type, obj.data.energy, list(obj.data.color)]
+		objects.append(entry)
+
+	return objects
+
+def blend_fingerprint():
+	"""Identify the saved .blend by modification time and size"""
+	path = bpy.data.filepath
+	if not path or not os.path.exists(path):
+		return None
+	stat = os.stat(path)
+	return {"file": os.path.basename(path), "mtime": stat.st_mtime, "size": stat.st_size}
+
+def pose_cache_params(config, scene):
+	"""Everything about a finger's renders except the per-frame angle"""
+	camera = scene.camera
+	return {
+		"config":   config,
+		"camera":   matrix_to_list(camera.matrix_world),
+		"lens":     [camera.data.lens, camera.data.type, camera.data.ortho_scale],
+		"render":   render_settings_fingerprint(scene),
+		"objects":  collection_fingerprint(config["collection"]),
+		"shared":   {name: collection_fingerprint(name) for name in SHARED_COLLECTIONS},
+		"blend":    blend_fingerprint(),
+	}
+
 def setup_scene():
 	"""Configure render settings"""
 	camera = bpy.data.objects.get(CAMERA_NAME)
@@ -80,8 +187,181 @@ def get_armature(armature_name):
 		raise RuntimeError(f"'{armature_name}' is not an armature")
 	return armature_obj
 
-def render_finger(finger_name, config, scene):
-	"""Activate the finger's collection, grab its armature, render all poses."""
+def render_pose(scene, pose_bone, axis, angle, frame_path, finger_name, frame):
+	"""Pose the bone at `angle` and render it to frame_path"""
+	with tracing.span("pose update", cat="render", finger=finger_name, frame=frame):
+		if axis == "x":
+			pose_bone.rotation_euler.x = angle
+		elif axis == "y":
+			pose_bone.rotation_euler.y = angle
+		elif axis == "z":
+			pose_bone.rotation_euler.z = angle
+
+		bpy.context.view_layer.update()
+
+	# Render and save separately so the two show up as their own spans
+	scene.render.filepath = frame_path
+	with tracing.span("render", cat="render", finger=finger_name, frame=frame):
+		bpy.ops.render.render()
+	with tracing.span("write", cat="render", finger=finger_name, frame=frame):
+		bpy.data.images["Render Result"].save_render(filepath=frame_path, scene=scene)
+
+def render_pose_animation(scene, armature_obj, pose_bone, axis, frames, raw_output, finger_name, on_frame=None):
+	"""
+	Render [(frame index, angle)] as an animation instead of one still per pose: the angles
+	are keyframed on the pose bone at their frame numbers and every run of consecutive
+	frames is rendered by a single animation render, which writes <finger>_NN.png itself.
+	on_frame(path) is called as Blender writes each frame. Scene and bone state are restored.
+	"""
+	index = AXIS_INDEX[axis]
+	anim = armature_obj.animation_data or armature_obj.animation_data_create()
+	previous_action = anim.action
+	saved = (scene.frame_start, scene.frame_end, scene.frame_step, scene.frame_current, scene.render.filepath)
+	paths = {frame: os.path.join(raw_output, f"{finger_name}_{frame:02d}.png") for frame, _ in frames}
+
+	def frame_written(scene, *args):
+		path = paths.get(scene.frame_current)
+		if path is not None and on_frame is not None:
+			on_frame(path)
+
+	# Consecutive frame numbers render together; cached frames split the runs
+	runs = []
+	for frame, _ in frames:
+		if runs and runs[-1][1] == frame - 1:
+			runs[-1][1] = frame
+		else:
+			runs.append([frame, frame])
+
+	anim.action = None
+	bpy.app.handlers.render_write.append(frame_written)
+	try:
+		with tracing.span("keyframe poses", cat="render", finger=finger_name, frames=len(frames)):
+			for frame, angle in frames:
+				pose_bone.rotation_euler[index] = angle
+				pose_bone.keyframe_insert(data_path="rotation_euler", index=index, frame=frame)
+
+		# "##" is replaced by the zero-padded frame number: <finger>_00.png, <finger>_01.png, ...
+		scene.render.filepath = os.path.join(raw_output, f"{finger_name}_##")
+		scene.frame_step = 1
+		for start, end in runs:
+			scene.frame_start = start
+			scene.frame_end = end
+			with tracing.span("render animation", cat="render", finger=finger_name, frames=end - start + 1):
+				bpy.ops.render.render(animation=True)
+	finally:
+		bpy.app.handlers.render_write.remove(frame_written)
+
+		action = anim.action
+		anim.action = previous_action
+		if action is not None and action is not previous_action:
+			bpy.data.actions.remove(action)
+
+		scene.frame_start, scene.frame_end, scene.frame_step, scene.frame_current, scene.render.filepath = saved
+
+def sample_adaptive_angles(finger_name, config, scene, pose_bone, cache, cache_params, raw_output, worker, force=False):
+	"""
+	Pick pose angles with adaptive_sampling.sample_poses(): every probe is rendered into
+	probe_output_dir() (or copied from a cached frame with the same angle), dithered by the
+	worker and compared with its neighbours there.
+	Returns (angles in animation order, {angle: probe render path}, Blender renders done).
+	"""
+	probe_dir = probe_output_dir(finger_name)
+	os.makedirs(probe_dir, exist_ok=True)
+
+	# Frames from earlier runs, by the pose key they were rendered with
+	reusable = {} if force else {
+		key: name for name, key in cache.entries.items() if os.path.exists(os.path.join(raw_output, name))
+	}
+	probes = {}
+	renders = 0
+
+	def render_probe(angle):
+		nonlocal renders
+		probe_path = os.path.join(probe_dir, f"{finger_name}_probe{len(probes):02d}.png")
+		existing = reusable.get(build_key([], dict(cache_params, angle=angle)))
+
+		if existing is not None:
+			shutil.copyfile(os.path.join(raw_output, existing), probe_path)
+		else:
+			render_pose(scene, pose_bone, config["rotation_axis"], angle, probe_path, finger_name, f"probe {len(probes)}")
+			renders += 1
+		probes[angle] = probe_path
+
+		dithered_path = probe_path.replace(".png", "_dithered.png")
+		reply = worker.wait(worker.submit(
+			probe_path,
+			dithered_path,
+			DITHER_CONFIG["matrix"],
+			DITHER_CONFIG["black_cutoff"],
+			DITHER_CONFIG["white_cutoff"],
+			algorithm=DITHER_CONFIG.get("algorithm", "ordered"),
+			serpentine=DITHER_CONFIG.get("serpentine", False)
+		))
+		if not reply["ok"]:
+			raise RuntimeError(f"Dithering probe at angle {angle:.4f} failed: {reply['error']}")
+
+		print(f"  Probe {len(probes) - 1:02d}: angle = {angle:.4f}{' (cached)' if existing else ''}")
+		return dithered_path
+
+	with tracing.span("adaptive sampling", cat="render", finger=finger_name):
+		chosen = sample_poses(
+			config["start_angle"],
+			config["end_angle"],
+			render_probe,
+			worker.difference,
+			budget=config["pose_count"],
+			threshold=SAMPLING_CONFIG.get("threshold", 0.01),
+			coarse=SAMPLING_CONFIG.get("coarse_poses", 5)
+		)
+
+	return [angle for angle, _ in chosen], probes, renders
+
+def remove_stale_frames(finger_name, raw_output, frame_count, cache, worker=None):
+	"""
+	Delete raw and dithered frames numbered frame_count or above, left over from a longer run.
+	With a dither worker the dithered deletions go through it, so its build manifest
+	only ever has one writer.
+	"""
+	dithered_dir = dithered_output_dir(finger_name)
+	stale = []
+
+	index = frame_count
+	while True:
+		filename = f"{finger_name}_{index:02d}.png"
+		raw_path = os.path.join(raw_output, filename)
+		dithered_path = os.path.join(dithered_dir, filename.replace(".png", "_dithered.png"))
+		if not os.path.exists(raw_path) and not os.path.exists(dithered_path):
+			break
+
+		if os.path.exists(raw_path):
+			os.remove(raw_path)
+		if os.path.exists(dithered_path):
+			stale.append(dithered_path)
+		cache.forget(filename)
+		index += 1
+
+	if not stale:
+		return
+
+	if worker is not None:
+		worker.remove(stale)
+		return
+
+	dithered_cache = BuildCache(dithered_dir)
+	for path in stale:
+		os.remove(path)
+		dithered_cache.forget(os.path.basename(path))
+	dithered_cache.save()
+
+def render_finger(finger_name, config, scene, force=False, on_frame=None, worker=None, batch=False):
+	"""
+	Activate the finger's collection, grab its armature, render all poses.
+	Frames whose pose inputs match the render cache manifest are reused unless force.
+	on_frame(path) is called as soon as each frame is on disk.
+	With batch, the poses that need rendering go through render_pose_animation().
+	With SAMPLING_CONFIG["mode"] == "adaptive" the angles are chosen by sample_adaptive_angles(),
+	which needs the dither `worker`.
+	"""
 	print(f"\n=== Rendering {finger_name.upper()} ===")
 
 	# --- Collection switch ---
@@ -106,42 +386,79 @@ def render_finger(finger_name, config, scene):
 
 	pose_bone.rotation_mode = 'XYZ'
 
+	# Render cache, fingerprinted before any pose is applied
+	cache = BuildCache(raw_output, force=force)
+	cache_params = pose_cache_params(config, scene)
+
 	# Store metadata
 	metadata = {
 		"finger":    finger_name,
 		"armature":  config["armature_name"],
 		"collection": config["collection"],
 		"bone":      config["bone_name"],
-		"frames":    []
+		"frames":    [],
+		"cache":     {"hits": 0, "misses": 0}
 	}
 
 	# Render loop
 	pose_count = config["pose_count"]
-	for i in range(pose_count):
-		t = i / (pose_count - 1) if pose_count > 1 else 0.0
-		angle = lerp(config["start_angle"], config["end_angle"], t)
-
-		axis = config["rotation_axis"]
-		if axis == "x":
-			pose_bone.rotation_euler.x = angle
-		elif axis == "y":
-			pose_bone.rotation_euler.y = angle
-		elif axis == "z":
-			pose_bone.rotation_euler.z = angle
-
-		bpy.context.view_layer.update()
-
-		filename = f"{finger_name}_{i:02d}.png"
-		scene.render.filepath = os.path.join(raw_output, filename)
-		bpy.ops.render.render(write_still=True)
-
-		metadata["frames"].append({
-			"index":    i,
-			"angle":    angle,
-			"filename": filename
-		})
-
-		print(f"  Frame {i:02d}: angle = {angle:.4f}")
+	probes = {}
+	try:
+		if SAMPLING_CONFIG.get("mode", "uniform") == "adaptive" and pose_count > 1:
+			angles, probes, probe_renders = sample_adaptive_angles(
+				finger_name, config, scene, pose_bone, cache, cache_params, raw_output, worker, force
+			)
+			metadata["sampling"] = {"mode": "adaptive", "probes": len(probes), "renders": probe_renders}
+			print(f"  Adaptive sampling: {len(angles)} poses from {len(probes)} probes ({probe_renders} rendered)")
+		else:
+			angles = [
+				lerp(config["start_angle"], config["end_angle"], i / (pose_count - 1) if pose_count > 1 else 0.0)
+				for i in range(pose_count)
+			]
+
+		batched = []
+		for i, angle in enumerate(angles):
+			filename = f"{finger_name}_{i:02d}.png"
+			frame_path = os.path.join(raw_output, filename)
+			key = build_key([], dict(cache_params, angle=angle))
+			cached = cache.is_fresh(filename, key)
+			deferred = not cached and batch and angle not in probes
+
+			if deferred:
+				batched.append((i, angle, key))
+			elif not cached:
+				if angle in probes:
+					os.replace(probes[angle], frame_path)
+				else:
+					render_pose(scene, pose_bone, config["rotation_axis"], angle, frame_path, finger_name, i)
+				cache.record(filename, key)
+
+			metadata["cache"]["hits" if cached else "misses"] += 1
+			metadata["frames"].append({
+				"index":    i,
+				"angle":    angle,
+				"filename": filename,
+				"cached":   cached
+			})
+
+			print(f"  Frame {i:02d}: angle = {angle:.4f}{' (cached)' if cached else ''}")
+
+			# Batched frames are announced as the animation render writes them
+			if on_frame is not None and not deferred:
+				on_frame(frame_path)
+
+		if batched:
+			render_pose_animation(
+				scene, armature_obj, pose_bone, config["rotation_axis"],
+				[(i, angle) for i, angle, _ in batched], raw_output, finger_name, on_frame
+			)
+			for i, _, key in batched:
+				cache.record(f"{finger_name}_{i:02d}.png", key)
+
+		remove_stale_frames(finger_name, raw_output, len(angles), cache, worker)
+	finally:
+		cache.save()
+		shutil.rmtree(probe_output_dir(finger_name), ignore_errors=True)
 
 	# Reset pose
 	pose_bone.rotation_euler = (0.0, 0.0, 0.0)
@@ -158,33 +475,68 @@ def render_finger(finger_name, config, scene):
 	print(f"  Metadata saved to {metadata_path}")
 	return raw_output
 
-def run_dithering(raw_output, finger_name):
-	"""Run dithering subprocess for a finger"""
-	print(f"\n=== Dithering {finger_name.upper()} ===")
-
+def dithered_output_dir(finger_name):
 	blend_dir = os.path.dirname(bpy.data.filepath)
 	project_root = os.path.dirname(blend_dir)
-	script = os.path.join(project_root, "processing", "dither.py")
-	dithered_output = os.path.join(project_root, "output", "dithered", finger_name)
-
-	result = subprocess.run([
-		"python3", script,
-		"--input",        raw_output,
-		"--output",       dithered_output,
-		"--matrix",       str(DITHER_CONFIG["matrix"]),
-		"--black-cutoff", str(DITHER_CONFIG["black_cutoff"]),
-		"--white-cutoff", str(DITHER_CONFIG["white_cutoff"]),
-	], capture_output=True, text=True)
+	return os.path.join(project_root, "output", "dithered", finger_name)
 
-	if result.returncode != 0:
-		print("STDERR:", result.stderr)
-		raise RuntimeError(f"Dithering failed for {finger_name}")
+def probe_output_dir(finger_name):
+	"""Staging dir for adaptive sampling probes, kept out of output/raw/ so watchers never see them"""
+	blend_dir = os.path.dirname(bpy.data.filepath)
+	project_root = os.path.dirname(blend_dir)
+	return os.path.join(project_root, "output", PROBE_DIR, finger_name)
+
+def submit_dithering(worker, frame_path, finger_name, force=False):
+	"""Hand a freshly written frame to the dither worker; returns its ticket"""
+	filename = os.path.basename(frame_path)
+	output_path = os.path.join(dithered_output_dir(finger_name), filename.replace(".png", "_dithered.png"))
+
+	return filename, worker.submit(
+		frame_path,
+		output_path,
+		DITHER_CONFIG["matrix"],
+		DITHER_CONFIG["black_cutoff"],
+		DITHER_CONFIG["white_cutoff"],
+		force=force,
+		algorithm=DITHER_CONFIG.get("algorithm", "ordered"),
+		serpentine=DITHER_CONFIG.get("serpentine", False)
+	)
+
+def run_dithering(worker, tickets, finger_name):
+	"""
+	Wait for the dither worker to finish every frame submitted for a finger.
+	Returns (dithered output dir, worker seconds per stage summed over the frames).
+	"""
+	print(f"\n=== Dithering {finger_name.upper()} ===")
 
-	print(f"  Dithered images saved to {dithered_output}")
-	return dithered_output
+	dithered_output = dithered_output_dir(finger_name)
+	failures = []
+	skipped = 0
+	timing = {"decode": 0.0, "dither": 0.0, "encode": 0.0}
+
+	with tracing.span("dither wait", cat="dither", finger=finger_name):
+		for filename, ticket in tickets:
+			reply = worker.wait(ticket)
+			if not reply["ok"]:
+				print(f"  FAILED {filename}: {reply['error']}")
+				failures.append(filename)
+			elif reply.get("skipped"):
+				skipped += 1
+			else:
+				for stage, seconds in reply.get("timing", {}).items():
+					timing[stage] = timing.get(stage, 0.0) + seconds
+
+	if failures:
+		raise RuntimeError(f"Dithering failed for {finger_name}: {', '.join(failures)}")
+
+	print(f"  Dithered images saved to {dithered_output} ({skipped} unchanged)")
+	return dithered_output, timing
 
 #-----Main-----#
 def main():
+	args = parse_script_args()
+	tracing.set_process_name(f"blender ({', '.join(args.fingers)})")
+
 	print(f"Available cameras:   {[o.name for o in bpy.data.objects if o.type == 'CAMERA']}")
 	print(f"Available armatures: {[o.name for o in bpy.data.objects if o.type == 'ARMATURE']}")
 	print(f"Top-level collections: {[c.name for c in bpy.context.scene.view_layers[0].layer_collection.children]}")
@@ -192,31 +544,64 @@ def main():
 	scene = setup_scene()
 	results = {}
 
-	for finger_name, config in FINGERS.items():
-		try:
-			raw_output      = render_finger(finger_name, config, scene)
-			dithered_output = run_dithering(raw_output, finger_name)
-
-			results[finger_name] = {
-				"raw":      raw_output,
-				"dithered": dithered_output,
-				"status":   "success"
-			}
-		except Exception as e:
-			print(f"ERROR processing {finger_name}: {e}")
-			results[finger_name] = {
-				"status": "failed",
-				"error":  str(e)
-			}
+	# One dither worker for the whole export: each frame is dithered
+	# while Blender renders the next pose. With --no-dither it is only
+	# started when adaptive sampling needs it to compare probes.
+	adaptive = SAMPLING_CONFIG.get("mode", "uniform") == "adaptive"
+	worker = None if args.no_dither and not adaptive else DitherWorker(python="python3")
+	try:
+		for finger_name in args.fingers:
+			config = FINGERS[finger_name]
+			tickets = []
+
+			def dither_frame(frame_path):
+				tickets.append(submit_dithering(worker, frame_path, finger_name, force=args.force))
+
+			try:
+				with tracing.span("render_finger", cat="render", finger=finger_name) as render_span:
+					raw_output = render_finger(finger_name, config, scene, force=args.force,
+						on_frame=None if args.no_dither else dither_frame, worker=worker, batch=args.batch_render)
+
+				if args.no_dither:
+					results[finger_name] = {
+						"raw":      raw_output,
+						"status":   "success",
+						"timing":   {"render": render_span.seconds}
+					}
+					continue
+
+				dithered_output, dither_timing = run_dithering(worker, tickets, finger_name)
+
+				results[finger_name] = {
+					"raw":      raw_output,
+					"dithered": dithered_output,
+					"status":   "success",
+					"timing":   {
+						"render": render_span.seconds,
+						"dither": sum(dither_timing.values()),
+						"dither_stages": dither_timing,
+					}
+				}
+			except Exception as e:
+				print(f"ERROR processing {finger_name}: {e}")
+				results[finger_name] = {
+					"status": "failed",
+					"error":  str(e)
+				}
+	finally:
+		if worker is not None:
+			worker.close()
 
 	# Save summary
 	blend_dir    = os.path.dirname(bpy.data.filepath)
 	project_root = os.path.dirname(blend_dir)
-	summary_path = os.path.join(project_root, "output", "export_summary.json")
+	summary_path = args.summary or os.path.join(project_root, "output", "export_summary.json")
 
 	with open(summary_path, 'w') as f:
 		json.dump(results, f, indent=2)
 
+	tracing.flush()
+
 	print(f"\n=== EXPORT COMPLETE ===")
 	print(f"Summary saved to {summary_path}")
 
@@ -64,8 +64,23 @@ SHARED_COLLECTIONS = ["EXPORT_CAM", "Lights"]
 
 CAMERA_NAME = "EXPORT_CAM"
 
+# "algorithm" is "ordered" or an error-diffusion kernel:
+# "floyd-steinberg", "atkinson", "sierra", "sierra-lite" ("serpentine" alternates scan direction)
+# "matrix" (ordered only) is a Bayer size (2, 4, 8, 16, ...) or a threshold map name:
+# "bayer8", "bluenoise64", "bluenoise64:3" (size:seed)
 DITHER_CONFIG = {
+	"algorithm":    "ordered",
 	"matrix":       4,
 	"black_cutoff": 10,
 	"white_cutoff": 170,
-}
\ No newline at end of file
+	"serpentine":   False,
+}
+
+# "mode" is "uniform" (pose_count evenly spaced angles) or "adaptive": render
+# "coarse_poses" keyframes, then split the angle intervals whose dithered frames
+# differ by more than "threshold" (fraction of pixels) until pose_count frames
+SAMPLING_CONFIG = {
+	"mode":         "uniform",
+	"coarse_poses": 5,
+	"threshold":    0.01,
+}
@@ -2,66 +2,356 @@
 Full pipeline runner - can be executed from Blender or command line
 """
 import subprocess
+import tempfile
+import argparse
+import shutil
+import json
 import os
 import sys
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, SCRIPT_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(SCRIPT_DIR), "processing"))
 
-from finger_config import FINGERS
+from finger_config import FINGERS, DITHER_CONFIG
+import tracing
 
-def run_blender_export(blend_file):
-	"""Run Blender export script"""
-	script = os.path.join(os.path.dirname(__file__), "export_all_fingers.py")
-	
-	result = subprocess.run([
-		"blender",
-		"--background",
-		blend_file,
-		"--python", script
-	], capture_output=True, text=True)
-	
-	print(result.stdout)
-	if result.returncode != 0:
-		print("ERROR:", result.stderr)
-		return False
-	return True
+def shard_fingers(fingers, shard_count):
+	"""
+	Split finger names into at most shard_count groups, balanced by pose count.
+	Each group keeps the FINGERS order.
+	"""
+	shard_count = max(1, min(shard_count, len(fingers)))
+	order = list(fingers.keys())
+	shards = [[] for _ in range(shard_count)]
+	loads = [0] * shard_count
+
+	# Heaviest fingers first, each onto the least loaded shard
+	for name in sorted(order, key=lambda n: -fingers[n]["pose_count"]):
+		target = loads.index(min(loads))
+		shards[target].append(name)
+		loads[target] += fingers[name]["pose_count"]
+
+	return [sorted(group, key=order.index) for group in shards if group]
+
+def merge_shard_summaries(shards, shard_results):
+	"""
+	Combine per-shard summaries into one dict in FINGERS order.
+	shard_results holds (returncode, summary dict or None, stderr) per shard;
+	fingers a shard never reported are marked failed with the shard's error.
+	"""
+	merged = {}
+	for index, (group, (returncode, summary, stderr)) in enumerate(zip(shards, shard_results)):
+		summary = summary or {}
+		for finger_name in group:
+			if finger_name in summary:
+				merged[finger_name] = summary[finger_name]
+				continue
+
+			reason = f"Blender shard {index} exited with code {returncode}" if returncode \
+				else f"Blender shard {index} produced no summary"
+			detail = stderr.strip().splitlines()[-1] if stderr and stderr.strip() else ""
+			merged[finger_name] = {
+				"status": "failed",
+				"error":  f"{reason}: {detail}" if detail else reason
+			}
+
+	order = list(FINGERS.keys())
+	return {name: merged[name] for name in sorted(merged, key=order.index)}
+
+def run_blender_export(blend_file, force=False, shards=1, blender="blender", dither=True, batch_render=False,
+		output_dir=None):
+	"""
+	Run the Blender export script, with FINGERS split across `shards`
+	concurrent Blender processes. Per-shard summaries are merged into
+	export_summary.json in output_dir (default: output/). Returns False if any shard failed.
+	With dither=False Blender only renders the raw frames; batch_render renders
+	each finger's poses with one animation render.
+	"""
+	script = os.path.join(SCRIPT_DIR, "export_all_fingers.py")
+	output_dir = output_dir or os.path.join(os.path.dirname(SCRIPT_DIR), "output")
+	os.makedirs(output_dir, exist_ok=True)
+
+	groups = shard_fingers(FINGERS, shards)
+	running = []
+
+	for index, group in enumerate(groups):
+		summary_path = os.path.join(output_dir, f"export_summary.shard{index}.json")
+		if os.path.exists(summary_path):
+			os.remove(summary_path)
+
+		script_args = ["--fingers", ",".join(group), "--summary", summary_path]
+		if force:
+			script_args.append("--force")
+		if not dither:
+			script_args.append("--no-dither")
+		if batch_render:
+			script_args.append("--batch-render")
+
+		# Logs go to temp files so a chatty shard never blocks on a full pipe
+		stdout = tempfile.TemporaryFile(mode="w+")
+		stderr = tempfile.TemporaryFile(mode="w+")
+		proc = subprocess.Popen([
+			blender,
+			"--background",
+			blend_file,
+			"--python", script,
+			"--", *script_args
+		], stdout=stdout, stderr=stderr, text=True)
+
+		print(f"Started Blender shard {index}: {', '.join(group)}")
+		running.append((proc, stdout, stderr, summary_path))
 
-def pack_all_sheets(project_root):
-	"""Pack sprite sheets for all fingers"""
+	ok = True
+	shard_results = []
+	for index, (proc, stdout, stderr, summary_path) in enumerate(running):
+		returncode = proc.wait()
+
+		stdout.seek(0)
+		stderr.seek(0)
+		out, err = stdout.read(), stderr.read()
+		stdout.close()
+		stderr.close()
+
+		print(f"--- Blender shard {index} ---")
+		print(out)
+		if returncode != 0:
+			print("ERROR:", err)
+			ok = False
+
+		summary = None
+		if os.path.exists(summary_path):
+			try:
+				with open(summary_path, 'r') as f:
+					summary = json.load(f)
+			except ValueError:
+				ok = False
+			os.remove(summary_path)
+		else:
+			ok = False
+
+		shard_results.append((returncode, summary, err))
+
+	results = merge_shard_summaries(groups, shard_results)
+	summary_path = os.path.join(output_dir, "export_summary.json")
+	with open(summary_path, 'w') as f:
+		json.dump(results, f, indent=2)
+
+	print(f"Summary saved to {summary_path}")
+	return ok
+
+def pack_all_sheets(project_root, force=False, sheet_format="png"):
+	"""
+	Pack sprite sheets for all fingers (unchanged sheets are skipped unless force).
+	sheet_format "1bit" writes packed Playdate 1bpp sheets (.bin) instead of PNGs.
+	Returns seconds spent packing each finger.
+	"""
 	script = os.path.join(project_root, "processing", "pack_spritesheet.py")
 	dithered_dir = os.path.join(project_root, "output", "dithered")
 	sheets_dir = os.path.join(project_root, "output", "spritesheets")
 	os.makedirs(sheets_dir, exist_ok=True)
+	pack_times = {}
 	
 	for finger_name in FINGERS.keys():
 		input_dir = os.path.join(dithered_dir, finger_name)
-		output_file = os.path.join(sheets_dir, f"{finger_name}_sheet.png")
+		extension = "bin" if sheet_format == "1bit" else "png"
+		output_file = os.path.join(sheets_dir, f"{finger_name}_sheet.{extension}")
 		
 		if not os.path.exists(input_dir):
 			print(f"Skipping {finger_name} - no dithered images")
 			continue
 		
-		subprocess.run([
+		cmd = [
 			"python3", script,
 			"--input", input_dir,
 			"--output", output_file,
 			"--width", "300",
 			"--height", "200",
-			"--columns", "4"
-		], check=True)
+			"--columns", "4",
+			"--format", sheet_format
+		]
+		if force:
+			cmd.append("--force")
+		
+		with tracing.span("pack", cat="pack", finger=finger_name) as pack_span:
+			subprocess.run(cmd, check=True)
+		pack_times[finger_name] = pack_span.seconds
+	
+	return pack_times
+
+def pack_combined_atlas(project_root, force=False, sheet_format="png", page_size=None, workers=None):
+	"""
+	Pack every finger's dithered frames into one combined atlas (or page_size pages)
+	plus its binary frame index, in a single process. Returns seconds spent.
+	"""
+	script = os.path.join(project_root, "processing", "combined_atlas.py")
+	dithered_dir = os.path.join(project_root, "output", "dithered")
+	extension = "bin" if sheet_format == "1bit" else "png"
+	
+	fingers = [name for name in FINGERS.keys() if os.path.exists(os.path.join(dithered_dir, name))]
+	for finger_name in FINGERS.keys():
+		if finger_name not in fingers:
+			print(f"Skipping {finger_name} - no dithered images")
+	
+	cmd = [
+		"python3", script,
+		"--input", dithered_dir,
+		"--output", os.path.join(project_root, "output", "spritesheets", f"hand_atlas.{extension}"),
+		"--fingers", ",".join(fingers),
+		"--width", "300",
+		"--height", "200",
+		"--format", sheet_format
+	]
+	if page_size is not None:
+		cmd += ["--page-size", str(page_size)]
+	if workers is not None:
+		cmd += ["--jobs", str(workers)]
+	if force:
+		cmd.append("--force")
+	
+	with tracing.span("pack_combined_atlas", cat="pack") as pack_span:
+		subprocess.run(cmd, check=True)
+	
+	return pack_span.seconds
+
+def stream_all_sheets(project_root, force=False, sheet_format="png", keep_dithered=False, workers=None):
+	"""
+	Dither and pack every finger's raw frames in memory (processing/stream_pipeline.py),
+	with fingers processed concurrently. keep_dithered also writes output/dithered/.
+	Returns (seconds spent per finger, whether every finger succeeded).
+	"""
+	from stream_pipeline import process_fingers
+	
+	raw_dir = os.path.join(project_root, "output", "raw")
+	dithered_dir = os.path.join(project_root, "output", "dithered")
+	sheets_dir = os.path.join(project_root, "output", "spritesheets")
+	extension = "bin" if sheet_format == "1bit" else "png"
+	
+	jobs = {}
+	for finger_name in FINGERS.keys():
+		input_dir = os.path.join(raw_dir, finger_name)
+		if not os.path.exists(input_dir):
+			print(f"Skipping {finger_name} - no raw renders")
+			continue
+		
+		jobs[finger_name] = {
+			"raw_dir":        input_dir,
+			"output_path":    os.path.join(sheets_dir, f"{finger_name}_sheet.{extension}"),
+			"matrix":         DITHER_CONFIG["matrix"],
+			"black_cutoff":   DITHER_CONFIG["black_cutoff"],
+			"white_cutoff":   DITHER_CONFIG["white_cutoff"],
+			"algorithm":      DITHER_CONFIG.get("algorithm", "ordered"),
+			"serpentine":     DITHER_CONFIG.get("serpentine", False),
+			"sprite_width":   300,
+			"sprite_height":  200,
+			"columns":        4,
+			"sheet_format":   sheet_format,
+			"dithered_dir":   os.path.join(dithered_dir, finger_name) if keep_dithered else None,
+			"force":          force,
+		}
+	
+	results = process_fingers(jobs, workers)
+	stream_times = {name: result["seconds"] for name, result in results.items() if "seconds" in result}
+	return stream_times, all(result["status"] != "failed" for result in results.values())
+
+def record_pack_timing(project_root, pack_times, stage="pack"):
+	"""Add per-finger packing time (or another stage's, under `stage`) to export_summary.json"""
+	summary_path = os.path.join(project_root, "output", "export_summary.json")
+	if not os.path.exists(summary_path):
+		return
+	
+	with open(summary_path, 'r') as f:
+		summary = json.load(f)
+	
+	for finger_name, seconds in pack_times.items():
+		if finger_name in summary:
+			summary[finger_name].setdefault("timing", {})[stage] = seconds
+	
+	with open(summary_path, 'w') as f:
+		json.dump(summary, f, indent=2)
+
+def write_trace(trace_dir, trace_path):
+	"""Merge every process's trace fragments into one Chrome trace and print stage totals"""
+	tracing.flush()
+	events = tracing.merge_traces(trace_dir, trace_path)
+	shutil.rmtree(trace_dir, ignore_errors=True)
+	
+	print(f"\n=== TIMING ===")
+	for name, entry in sorted(tracing.summarize(events).items(), key=lambda item: -item[1]["seconds"]):
+		print(f"  {name:<20} {entry['seconds']:>8.2f}s  ({entry['count']}x)")
+	print(f"Trace saved to {trace_path} (open in chrome://tracing or ui.perfetto.dev)")
 
 if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Run the full render -> dither -> pack pipeline")
+	parser.add_argument("--force", action="store_true", help="Rebuild every output, ignoring build caches")
+	parser.add_argument("--shards", type=int, default=1,
+		help="Concurrent Blender processes to split FINGERS across (default: 1)")
+	parser.add_argument("--blender", default=os.environ.get("BLENDER", "blender"),
+		help="Blender executable (default: $BLENDER or 'blender' on PATH)")
+	parser.add_argument("--sheet-format", choices=["png", "1bit"], default="png",
+		help="Sprite sheet output: RGBA PNG or packed Playdate 1bpp planes")
+	parser.add_argument("--batch-render", action="store_true",
+		help="Render each finger's poses as one keyframed animation instead of one still per pose")
+	parser.add_argument("--in-memory", action="store_true",
+		help="Blender only renders; dither and pack every finger in one process, without intermediate PNGs")
+	parser.add_argument("--keep-dithered", action="store_true",
+		help="--in-memory: still write the dithered frames to output/dithered/")
+	parser.add_argument("--jobs", type=int, default=None,
+		help="--in-memory: fingers processed concurrently; --combined-atlas: decoding threads (default: number of available CPUs)")
+	parser.add_argument("--combined-atlas", action="store_true",
+		help="Pack all fingers into one atlas plus a binary frame index instead of one sheet per finger")
+	parser.add_argument("--page-size", type=int, default=None,
+		help="--combined-atlas: pack onto square pages of this size (default: one atlas)")
+	parser.add_argument("--trace", default=None,
+		help="Record timing spans from every stage and subprocess into this Chrome trace JSON")
+	args = parser.parse_args()
+	
+	if args.shards < 1:
+		parser.error("--shards must be at least 1")
+	if args.jobs is not None and args.jobs < 1:
+		parser.error("--jobs must be at least 1")
+	if args.combined_atlas and args.in_memory:
+		parser.error("--combined-atlas packs output/dithered/ and cannot be combined with --in-memory")
+	if args.page_size is not None and args.page_size < 1:
+		parser.error("--page-size must be at least 1")
+	
 	project_root = os.path.dirname(os.path.dirname(__file__))
 	blend_file = os.path.join(project_root, "blender", "protoHand_split.blend")
 	
-	print("=== RUNNING FULL PIPELINE ===")
+	trace_dir = None
+	if args.trace:
+		trace_dir = tempfile.mkdtemp(prefix="sprite_trace_")
+		tracing.enable(trace_dir)
+		tracing.set_process_name("run_pipeline.py")
 	
-	# Step 1: Blender export + dithering
-	if not run_blender_export(blend_file):
-		sys.exit(1)
+	print("=== RUNNING FULL PIPELINE ===")
 	
-	# Step 2: Pack sprite sheets
-	pack_all_sheets(project_root)
+	try:
+		# Step 1: Blender export + dithering
+		with tracing.span("run_blender_export"):
+			exported = run_blender_export(blend_file, force=args.force, shards=args.shards, blender=args.blender,
+				dither=not args.in_memory, batch_render=args.batch_render)
+		if not exported:
+			sys.exit(1)
+		
+		# Step 2: Pack sprite sheets (dithering them on the way with --in-memory)
+		if args.in_memory:
+			with tracing.span("stream_all_sheets"):
+				stream_times, streamed = stream_all_sheets(project_root, force=args.force,
+					sheet_format=args.sheet_format, keep_dithered=args.keep_dithered, workers=args.jobs)
+			record_pack_timing(project_root, stream_times, stage="dither_pack")
+			if not streamed:
+				sys.exit(1)
+		elif args.combined_atlas:
+			atlas_seconds = pack_combined_atlas(project_root, force=args.force, sheet_format=args.sheet_format,
+				page_size=args.page_size, workers=args.jobs)
+			print(f"Combined atlas packed in {atlas_seconds:.2f}s")
+		else:
+			with tracing.span("pack_all_sheets"):
+				pack_times = pack_all_sheets(project_root, force=args.force, sheet_format=args.sheet_format)
+			record_pack_timing(project_root, pack_times)
+	finally:
+		if trace_dir:
+			write_trace(trace_dir, args.trace)
 	
 	print("\n=== PIPELINE COMPLETE ===")
\ No newline at end of file
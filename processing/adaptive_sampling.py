@@ -0,0 +1,59 @@
+"""
+Adaptive pose sampling
+Instead of pose_count evenly spaced angles, render a few coarse keyframes,
+then keep splitting the interval whose neighbouring frames differ the most
+(after dithering) until every interval is below the threshold or the frame
+budget is spent. Pure function over render/difference callbacks, standard
+library only, so it runs inside Blender and can be exercised without it.
+"""
+import heapq
+
+DEFAULT_COARSE_POSES = 5
+DEFAULT_THRESHOLD = 0.01    # fraction of pixels that may change between neighbouring frames
+
+def sample_poses(start_angle, end_angle, render, difference, budget, threshold=DEFAULT_THRESHOLD,
+		coarse=DEFAULT_COARSE_POSES):
+	"""
+	Choose up to `budget` angles between start_angle and end_angle (both always included).
+	render(angle) renders one pose and returns whatever difference() compares;
+	difference(a, b) returns how much two rendered poses differ (e.g. the changed pixel fraction).
+	Returns [(angle, render result)] ordered from start_angle to end_angle.
+	"""
+	if budget < 1:
+		raise ValueError(f"Frame budget must be at least 1, got {budget}")
+
+	def angle_at(t):
+		return start_angle + (end_angle - start_angle) * t
+
+	if budget == 1 or start_angle == end_angle:
+		return [(start_angle, render(start_angle))]
+
+	# Positions are kept as t in [0, 1] so the result is ordered start -> end either way round
+	coarse = max(2, min(coarse, budget))
+	samples = {}
+	for i in range(coarse):
+		t = i / (coarse - 1)
+		samples[t] = render(angle_at(t))
+
+	intervals = []
+
+	def consider(t0, t1):
+		diff = difference(samples[t0], samples[t1])
+		if diff > threshold:
+			heapq.heappush(intervals, (-diff, t0, t1))
+
+	ts = sorted(samples)
+	for t0, t1 in zip(ts, ts[1:]):
+		consider(t0, t1)
+
+	while intervals and len(samples) < budget:
+		_, t0, t1 = heapq.heappop(intervals)
+		t = (t0 + t1) / 2
+		if t in (t0, t1):
+			continue    # interval can't be split any finer
+
+		samples[t] = render(angle_at(t))
+		consider(t0, t)
+		consider(t, t1)
+
+	return [(angle_at(t), samples[t]) for t in sorted(samples)]
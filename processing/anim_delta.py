@@ -0,0 +1,254 @@
+"""
+Delta-encoded animation strips for pose sequences
+Every frame is reduced to its 1-bit planes (white + opaque, packed like the
+Playdate sheets). Keyframes store the planes, every other frame stores the
+XOR against the previous frame; both are run-length encoded. A frame table
+in the header lets the decoder seek straight to the nearest keyframe.
+
+File layout (little endian):
+  header   "PDDA", version u8, flags u8 (bit 0 = mask plane), width u16, height u16,
+           frame_count u16, keyframe_interval u16
+  table    frame_count x (offset u32, length u32, keyframe u8)
+  data     RLE payloads: repeated [zero run varint][literal length varint][literal bytes]
+"""
+from PIL import Image
+import numpy as np
+import argparse
+import os
+import struct
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+
+from pack_spritesheet import list_sprites, pack_spritesheet
+from playdate_bitmap import image_to_planes, pack_plane, row_stride, unpack_plane
+
+MAGIC = b"PDDA"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHHHH")
+TABLE_ENTRY = struct.Struct("<IIB")
+FLAG_MASK = 1
+DEFAULT_KEYFRAME_INTERVAL = 8
+MIN_ZERO_RUN = 3    # shorter zero gaps are cheaper to keep inside a literal
+
+#-----RLE-----#
+def _write_varint(out, value):
+	while value >= 0x80:
+		out.append((value & 0x7F) | 0x80)
+		value >>= 7
+	out.append(value)
+
+def _read_varint(data, pos):
+	value = shift = 0
+	while True:
+		byte = data[pos]
+		pos += 1
+		value |= (byte & 0x7F) << shift
+		if byte < 0x80:
+			return value, pos
+		shift += 7
+
+def rle_encode(data: bytes) -> bytes:
+	"""Encode as alternating zero runs and literal byte runs"""
+	arr = np.frombuffer(data, dtype=np.uint8)
+	nonzero = np.flatnonzero(arr)
+	out = bytearray()
+
+	if len(nonzero) == 0:
+		_write_varint(out, len(arr))
+		_write_varint(out, 0)
+		return bytes(out)
+
+	# Literal spans: nonzero bytes, bridging zero gaps shorter than MIN_ZERO_RUN
+	breaks = np.flatnonzero(np.diff(nonzero) > MIN_ZERO_RUN)
+	starts = np.concatenate(([nonzero[0]], nonzero[breaks + 1]))
+	ends = np.concatenate((nonzero[breaks], [nonzero[-1]])) + 1
+
+	pos = 0
+	for start, end in zip(starts.tolist(), ends.tolist()):
+		_write_varint(out, start - pos)
+		_write_varint(out, end - start)
+		out += data[start:end]
+		pos = end
+
+	if pos < len(arr):
+		_write_varint(out, len(arr) - pos)
+		_write_varint(out, 0)
+
+	return bytes(out)
+
+def rle_decode(data: bytes, size: int) -> bytes:
+	out = bytearray(size)
+	pos = dst = 0
+	while pos < len(data):
+		zeros, pos = _read_varint(data, pos)
+		literal, pos = _read_varint(data, pos)
+		dst += zeros
+		out[dst:dst + literal] = data[pos:pos + literal]
+		pos += literal
+		dst += literal
+	return bytes(out)
+
+#-----Encoding-----#
+def frame_planes(image: Image.Image, with_mask=True) -> bytes:
+	"""Packed white plane, followed by the packed opaque plane if with_mask"""
+	white, opaque = image_to_planes(image)
+	data = pack_plane(white)
+	if with_mask:
+		data += pack_plane(opaque)
+	return data
+
+def encode_strip(images, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, with_mask=True) -> bytes:
+	"""Encode same-size frames as a keyframe + XOR delta strip"""
+	if not images:
+		raise ValueError("No frames to encode")
+
+	width, height = images[0].size
+	for idx, image in enumerate(images):
+		if image.size != (width, height):
+			raise ValueError(f"Frame {idx} is {image.size[0]}x{image.size[1]}, expected {width}x{height}")
+
+	payloads = []
+	previous = None
+	for idx, image in enumerate(images):
+		planes = np.frombuffer(frame_planes(image, with_mask), dtype=np.uint8)
+		keyframe = idx % keyframe_interval == 0
+		source = planes if keyframe else np.bitwise_xor(planes, previous)
+		payloads.append((rle_encode(source.tobytes()), keyframe))
+		previous = planes
+
+	header = HEADER.pack(MAGIC, VERSION, FLAG_MASK if with_mask else 0, width, height, len(images), keyframe_interval)
+	offset = HEADER.size + TABLE_ENTRY.size * len(payloads)
+
+	table = bytearray()
+	for payload, keyframe in payloads:
+		table += TABLE_ENTRY.pack(offset, len(payload), keyframe)
+		offset += len(payload)
+
+	return header + bytes(table) + b"".join(payload for payload, _ in payloads)
+
+#-----Decoding-----#
+class AnimationStrip:
+	"""Random-access decoder for a delta strip"""
+
+	def __init__(self, data: bytes):
+		magic, version, flags, width, height, frame_count, interval = HEADER.unpack_from(data, 0)
+		if magic != MAGIC:
+			raise ValueError("Not a delta animation strip")
+		if version != VERSION:
+			raise ValueError(f"Unsupported strip version {version}")
+
+		self.data = data
+		self.width = width
+		self.height = height
+		self.frame_count = frame_count
+		self.keyframe_interval = interval
+		self.has_mask = bool(flags & FLAG_MASK)
+		self.stride = row_stride(width)
+		self.plane_size = self.stride * height * (2 if self.has_mask else 1)
+		self.table = [
+			TABLE_ENTRY.unpack_from(data, HEADER.size + i * TABLE_ENTRY.size)
+			for i in range(frame_count)
+		]
+
+		# Last decoded frame, so sequential playback applies one delta per frame
+		self._cursor = None
+
+	@classmethod
+	def open(cls, path):
+		with open(path, 'rb') as f:
+			return cls(f.read())
+
+	def _payload(self, index):
+		offset, length, _ = self.table[index]
+		raw = rle_decode(self.data[offset:offset + length], self.plane_size)
+		return np.frombuffer(raw, dtype=np.uint8)
+
+	def planes(self, index):
+		"""Packed plane bytes of frame `index`"""
+		if not 0 <= index < self.frame_count:
+			raise IndexError(f"Frame {index} out of range (0-{self.frame_count - 1})")
+
+		keyframe = index
+		while not self.table[keyframe][2]:
+			keyframe -= 1
+
+		# Continue from the last decoded frame when it is closer than the keyframe
+		if self._cursor is not None and keyframe <= self._cursor[0] <= index:
+			start, planes = self._cursor
+		else:
+			start, planes = keyframe, self._payload(keyframe)
+
+		for i in range(start + 1, index + 1):
+			planes = np.bitwise_xor(planes, self._payload(i))
+
+		self._cursor = (index, planes)
+		return planes
+
+	def frame(self, index) -> np.ndarray:
+		"""Frame `index` as an (H, W, 4) uint8 RGBA array"""
+		planes = self.planes(index).tobytes()
+		plane_bytes = self.stride * self.height
+
+		white = unpack_plane(planes[:plane_bytes], self.width, self.height, self.stride)
+		gray = np.where(white, 255, 0).astype(np.uint8)
+		if self.has_mask:
+			opaque = unpack_plane(planes[plane_bytes:], self.width, self.height, self.stride)
+			alpha = np.where(opaque, 255, 0).astype(np.uint8)
+		else:
+			alpha = np.full((self.height, self.width), 255, dtype=np.uint8)
+
+		return np.dstack([gray, gray, gray, alpha])
+
+#-----Report-----#
+def png_sheet_size(input_dir, width, height, columns):
+	"""Size in bytes of the PNG sheet pack_spritesheet would write for these frames"""
+	with tempfile.TemporaryDirectory() as tmp:
+		sheet_path = os.path.join(tmp, "sheet.png")
+		with redirect_stdout(StringIO()):
+			pack_spritesheet(input_dir, sheet_path, width, height, columns)
+		return os.path.getsize(sheet_path)
+
+def main():
+	parser = argparse.ArgumentParser(description="Encode dithered pose frames as a keyframe + XOR delta strip")
+	parser.add_argument("--input", required=True, help="Input directory with dithered sprites")
+	parser.add_argument("--output", required=True, help="Output strip path (.pdda)")
+	parser.add_argument("--keyframe-interval", type=int, default=DEFAULT_KEYFRAME_INTERVAL,
+		help="Store a full keyframe every N frames for fast seeking")
+	parser.add_argument("--no-mask", action="store_true", help="Omit the opaque plane")
+	parser.add_argument("--sheet", default=None,
+		help="PNG sheet to compare against (default: pack the same frames into a 4-column sheet)")
+
+	args = parser.parse_args()
+	if args.keyframe_interval < 1:
+		parser.error("--keyframe-interval must be at least 1")
+
+	files = list_sprites(args.input)
+	images = [Image.open(os.path.join(args.input, f)) for f in files]
+
+	data = encode_strip(images, args.keyframe_interval, with_mask=not args.no_mask)
+	os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+	with open(args.output, 'wb') as f:
+		f.write(data)
+
+	# Verify the round trip before reporting
+	strip = AnimationStrip(data)
+	for idx, image in enumerate(images):
+		expected = np.frombuffer(frame_planes(image, not args.no_mask), dtype=np.uint8)
+		if not np.array_equal(strip.planes(idx), expected):
+			raise RuntimeError(f"Round trip mismatch on frame {idx} ({files[idx]})")
+
+	width, height = images[0].size
+	if args.sheet:
+		sheet_bytes = os.path.getsize(args.sheet)
+	else:
+		sheet_bytes = png_sheet_size(args.input, width, height, 4)
+	raw_bytes = strip.plane_size * len(images)
+
+	print(f"Encoded {len(images)} frames into {args.output}")
+	print(f"  PNG sheet:       {sheet_bytes:>10,} bytes")
+	print(f"  raw 1bpp planes: {raw_bytes:>10,} bytes")
+	print(f"  delta strip:     {len(data):>10,} bytes ({len(data) / sheet_bytes:.0%} of the PNG sheet)")
+
+if __name__ == "__main__":
+	main()
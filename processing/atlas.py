@@ -0,0 +1,169 @@
+"""
+MaxRects bin packing for trimmed sprite atlases
+Pure Python; rects are (width, height) tuples, placements are (x, y) tuples.
+"""
+
+# Atlas widths tried, as multiples of the square root of the total rect area
+WIDTH_FACTORS = (1.0, 1.1, 1.25, 1.5, 2.0)
+
+class MaxRectsBin:
+	"""
+	A single bin tracked as a list of maximal free rectangles.
+	Placement uses the best-short-side-fit heuristic.
+	"""
+
+	def __init__(self, width, height):
+		self.width = width
+		self.height = height
+		self.free = [(0, 0, width, height)]
+
+	def insert(self, w, h):
+		"""Place a w x h rect; returns (x, y) or None if it does not fit"""
+		best = None
+		best_score = None
+
+		for fx, fy, fw, fh in self.free:
+			if w > fw or h > fh:
+				continue
+			score = (min(fw - w, fh - h), max(fw - w, fh - h))
+			if best_score is None or score < best_score:
+				best, best_score = (fx, fy), score
+
+		if best is None:
+			return None
+
+		self._place((best[0], best[1], w, h))
+		return best
+
+	def _place(self, used):
+		ux, uy, uw, uh = used
+		new_free = []
+
+		for free in self.free:
+			fx, fy, fw, fh = free
+			# No overlap: keep as is
+			if ux >= fx + fw or ux + uw <= fx or uy >= fy + fh or uy + uh <= fy:
+				new_free.append(free)
+				continue
+
+			# Split the overlapped free rect into up to four maximal pieces
+			if ux > fx:
+				new_free.append((fx, fy, ux - fx, fh))
+			if ux + uw < fx + fw:
+				new_free.append((ux + uw, fy, fx + fw - (ux + uw), fh))
+			if uy > fy:
+				new_free.append((fx, fy, fw, uy - fy))
+			if uy + uh < fy + fh:
+				new_free.append((fx, uy + uh, fw, fy + fh - (uy + uh)))
+
+		self.free = _prune(new_free)
+
+def _contains(outer, inner):
+	ox, oy, ow, oh = outer
+	ix, iy, iw, ih = inner
+	return ix >= ox and iy >= oy and ix + iw <= ox + ow and iy + ih <= oy + oh
+
+def _prune(rects):
+	"""Drop free rects fully contained in another one"""
+	rects = list(dict.fromkeys(rects))
+	return [
+		r for i, r in enumerate(rects)
+		if not any(j != i and _contains(other, r) for j, other in enumerate(rects))
+	]
+
+def _pack_into(sizes, order, width, height):
+	"""Pack sizes in the given order into one width x height bin, or None"""
+	bin_ = MaxRectsBin(width, height)
+	positions = [None] * len(sizes)
+
+	for i in order:
+		w, h = sizes[i]
+		if w == 0 or h == 0:
+			positions[i] = (0, 0)
+			continue
+		placed = bin_.insert(w, h)
+		if placed is None:
+			return None
+		positions[i] = placed
+
+	return positions
+
+def pack_rects(sizes, max_size=None):
+	"""
+	Pack (w, h) rects into the smallest atlas found over a range of widths.
+	Returns (atlas_width, atlas_height, positions) with positions in input order.
+	Raises ValueError if max_size is given and the rects cannot fit.
+	"""
+	nonempty = [i for i, (w, h) in enumerate(sizes) if w and h]
+	if not nonempty:
+		return 0, 0, [(0, 0)] * len(sizes)
+	placed = [sizes[i] for i in nonempty]
+
+	# Biggest first, ties broken by input order for a stable layout
+	order = sorted(range(len(sizes)), key=lambda i: (-max(sizes[i]), -sizes[i][0] * sizes[i][1], i))
+
+	min_width = max(w for w, _ in placed)
+	total_area = sum(w * h for w, h in placed)
+	total_height = sum(h for _, h in placed)
+	limit = max_size or max(min_width, total_height)
+
+	if max_size is not None and (min_width > max_size or max(h for _, h in placed) > max_size):
+		raise ValueError(f"A frame is larger than the maximum atlas size {max_size}")
+
+	candidate_widths = {min(limit, max(min_width, int(total_area ** 0.5 * f))) for f in WIDTH_FACTORS}
+	candidate_widths.add(min_width)
+	if max_size is not None:
+		candidate_widths.add(max_size)
+
+	best = None
+	for width in sorted(candidate_widths):
+		positions = _pack_into(sizes, order, width, max_size or total_height)
+		if positions is None:
+			continue
+
+		used_w = max(positions[i][0] + sizes[i][0] for i in nonempty)
+		used_h = max(positions[i][1] + sizes[i][1] for i in nonempty)
+		if best is None or used_w * used_h < best[0] * best[1]:
+			best = (used_w, used_h, positions)
+
+	if best is None:
+		raise ValueError(f"Frames do not fit in a {max_size}x{max_size} atlas")
+
+	return best
+
+def pack_pages(sizes, page_size):
+	"""
+	Pack (w, h) rects onto as many page_size x page_size pages as needed.
+	Each rect goes on the first page it fits (biggest rects first), opening a new page otherwise.
+	Returns (page sizes trimmed to the used area, (page, x, y) per rect in input order).
+	Raises ValueError if a rect is larger than a page.
+	"""
+	for w, h in sizes:
+		if w > page_size or h > page_size:
+			raise ValueError(f"A {w}x{h} frame is larger than the {page_size}x{page_size} atlas page")
+
+	order = sorted(range(len(sizes)), key=lambda i: (-max(sizes[i]), -sizes[i][0] * sizes[i][1], i))
+	bins = []
+	used = []
+	placements = [(0, 0, 0)] * len(sizes)
+
+	for i in order:
+		w, h = sizes[i]
+		if w == 0 or h == 0:
+			continue
+
+		for page, bin_ in enumerate(bins):
+			placed = bin_.insert(w, h)
+			if placed is not None:
+				break
+		else:
+			page = len(bins)
+			bins.append(MaxRectsBin(page_size, page_size))
+			used.append((0, 0))
+			placed = bins[page].insert(w, h)
+
+		x, y = placed
+		placements[i] = (page, x, y)
+		used[page] = (max(used[page][0], x + w), max(used[page][1], y + h))
+
+	return used, placements
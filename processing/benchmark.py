@@ -0,0 +1,193 @@
+"""
+Benchmarks for the dither and pack stages
+Runs offline on synthetic frames (numpy + Pillow only), writes results to a
+JSON baseline, and in --compare mode fails when a stage got slower than the
+allowed percentage.
+"""
+from PIL import Image
+import numpy as np
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+from dither import dither_image, ordered_dither
+from error_diffusion import KERNELS
+from threshold_maps import get_threshold_map
+from pack_spritesheet import pack_spritesheet
+
+#-----Configuration-----#
+FRAME_SIZES = [(300, 200), (1920, 1080)]
+THRESHOLD_MAPS = ["bayer2", "bayer4", "bayer8", "bayer16", "bluenoise64"]
+DIFFUSION_KERNELS = list(KERNELS)
+PACK_FRAME_COUNTS = [16, 81]
+PACK_COLUMNS = [4, 9]
+PACK_FRAME_SIZE = (300, 200)
+ALPHA_COVERAGE = 0.35   # fraction of each frame covered by the "hand"
+DEFAULT_REPEATS = 5
+DEFAULT_THRESHOLD = 10.0
+
+#-----Synthetic Frames-----#
+def synthetic_frame(width, height, seed=0):
+	"""
+	RGBA render look-alike: a shaded, soft-edged ellipse on a transparent
+	background covering roughly ALPHA_COVERAGE of the frame.
+	"""
+	rng = np.random.default_rng(seed)
+	yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+
+	# Ellipse area = pi * rx * ry; pick radii for the target coverage
+	aspect = width / height
+	ry = np.sqrt(ALPHA_COVERAGE * width * height / (np.pi * aspect))
+	rx = ry * aspect
+	cx = width / 2 + rng.uniform(-0.05, 0.05) * width
+	cy = height / 2 + rng.uniform(-0.05, 0.05) * height
+
+	dist = np.sqrt(((xx - cx) / rx) ** 2 + ((yy - cy) / ry) ** 2)
+	alpha = np.clip((1.0 - dist) * ry / 2, 0, 1) * 255
+
+	# Diagonal light falloff plus a dark rim, like the outlined hand renders
+	shade = 60 + 190 * (xx / width * 0.5 + (1 - yy / height) * 0.5)
+	shade = np.where(dist > 0.93, 5, shade)
+	shade = np.clip(shade + rng.normal(0, 4, shade.shape), 0, 255)
+
+	rgba = np.dstack([shade, shade, shade, alpha]).astype(np.uint8)
+	return Image.fromarray(rgba, mode="RGBA")
+
+#-----Timing-----#
+def best_time(fn, repeats):
+	"""Minimum wall time of `repeats` calls, after one warm-up call"""
+	fn()
+	times = []
+	for _ in range(repeats):
+		start = time.perf_counter()
+		fn()
+		times.append(time.perf_counter() - start)
+	return min(times)
+
+def result_entry(seconds, frames, pixels):
+	return {
+		"seconds":    seconds,
+		"fps":        frames / seconds,
+		"mpix_per_s": pixels / seconds / 1e6,
+	}
+
+def bench_dither(repeats):
+	results = {}
+	for width, height in FRAME_SIZES:
+		frame = synthetic_frame(width, height)
+		for name in THRESHOLD_MAPS:
+			bayer = get_threshold_map(name)
+			seconds = best_time(lambda: ordered_dither(frame, bayer, 10, 170), repeats)
+			results[f"dither/ordered/{width}x{height}/{name}"] = result_entry(seconds, 1, width * height)
+		for kernel in DIFFUSION_KERNELS:
+			seconds = best_time(lambda: dither_image(frame, None, 10, 170, kernel, serpentine=True), repeats)
+			results[f"dither/{kernel}/{width}x{height}"] = result_entry(seconds, 1, width * height)
+	return results
+
+def bench_pack(repeats):
+	results = {}
+	width, height = PACK_FRAME_SIZE
+	bayer = get_threshold_map("bayer4")
+
+	with tempfile.TemporaryDirectory() as tmp:
+		input_dir = os.path.join(tmp, "dithered")
+		os.makedirs(input_dir)
+
+		for frame_count in PACK_FRAME_COUNTS:
+			# Reuse frames already written for a smaller count
+			for i in range(frame_count):
+				path = os.path.join(input_dir, f"bench_{i:03d}_dithered.png")
+				if not os.path.exists(path):
+					ordered_dither(synthetic_frame(width, height, seed=i), bayer, 10, 170).save(path)
+
+			count_dir = os.path.join(tmp, f"count_{frame_count}")
+			os.makedirs(count_dir)
+			for i in range(frame_count):
+				name = f"bench_{i:03d}_dithered.png"
+				os.link(os.path.join(input_dir, name), os.path.join(count_dir, name))
+
+			for columns in PACK_COLUMNS:
+				output = os.path.join(tmp, f"sheet_{frame_count}_{columns}.png")
+
+				def run():
+					with redirect_stdout(StringIO()):
+						pack_spritesheet(count_dir, output, width, height, columns)
+
+				seconds = best_time(run, repeats)
+				results[f"pack/{frame_count}frames/{columns}cols"] = result_entry(
+					seconds, frame_count, frame_count * width * height
+				)
+	return results
+
+def run_benchmarks(repeats=DEFAULT_REPEATS):
+	return {
+		"meta": {
+			"python":   platform.python_version(),
+			"numpy":    np.__version__,
+			"pillow":   Image.__version__,
+			"platform": platform.platform(),
+			"repeats":  repeats,
+		},
+		"results": {**bench_dither(repeats), **bench_pack(repeats)},
+	}
+
+#-----Reporting-----#
+def print_results(results):
+	print(f"{'benchmark':<40} {'ms':>10} {'fps':>10} {'MP/s':>10}")
+	for name, entry in results.items():
+		print(f"{name:<40} {entry['seconds'] * 1000:>10.2f} {entry['fps']:>10.1f} {entry['mpix_per_s']:>10.1f}")
+
+def compare(baseline, current, threshold):
+	"""Return names of benchmarks more than `threshold` percent slower than baseline"""
+	regressions = []
+	print(f"\n{'benchmark':<40} {'base ms':>10} {'now ms':>10} {'change':>9}")
+	for name, entry in current.items():
+		base = baseline.get(name)
+		if base is None:
+			print(f"{name:<40} {'-':>10} {entry['seconds'] * 1000:>10.2f} {'new':>9}")
+			continue
+
+		change = (entry["seconds"] / base["seconds"] - 1) * 100
+		flag = "  SLOWER" if change > threshold else ""
+		print(f"{name:<40} {base['seconds'] * 1000:>10.2f} {entry['seconds'] * 1000:>10.2f} {change:>+8.1f}%{flag}")
+		if change > threshold:
+			regressions.append(name)
+	return regressions
+
+#-----CLI-----#
+def main():
+	parser = argparse.ArgumentParser(description="Benchmark the dither and pack stages")
+	parser.add_argument("--output", help="Write results to this JSON baseline")
+	parser.add_argument("--compare", help="Baseline JSON to compare against")
+	parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+		help="Allowed slowdown in percent before --compare fails")
+	parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="Timed runs per benchmark (best is kept)")
+
+	args = parser.parse_args()
+
+	report = run_benchmarks(args.repeats)
+	print_results(report["results"])
+
+	if args.output:
+		with open(args.output, 'w') as f:
+			json.dump(report, f, indent=2)
+		print(f"\nResults saved to {args.output}")
+
+	if args.compare:
+		with open(args.compare, 'r') as f:
+			baseline = json.load(f)
+
+		regressions = compare(baseline["results"], report["results"], args.threshold)
+		if regressions:
+			print(f"\n{len(regressions)} benchmark(s) slower than {args.threshold:.0f}%: {', '.join(regressions)}")
+			sys.exit(1)
+		print(f"\nNo regressions beyond {args.threshold:.0f}%")
+
+if __name__ == "__main__":
+	main()
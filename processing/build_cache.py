@@ -0,0 +1,67 @@
+"""
+Content-hash build manifest shared by the dither and pack stages.
+Each output is keyed on the hashes of its inputs plus the exact parameters
+that produced it; outputs whose key is unchanged can be skipped.
+Standard library only, so Blender's bundled Python can import it too.
+"""
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = ".build_cache.json"
+
+def file_digest(path):
+	"""SHA-256 of a file's contents"""
+	digest = hashlib.sha256()
+	with open(path, 'rb') as f:
+		for chunk in iter(lambda: f.read(1 << 20), b""):
+			digest.update(chunk)
+	return digest.hexdigest()
+
+def build_key(input_paths, params):
+	"""Key for an output built from the ordered input files with the given params"""
+	payload = {
+		"inputs": [[os.path.basename(p), file_digest(p)] for p in input_paths],
+		"params": params,
+	}
+	blob = json.dumps(payload, sort_keys=True).encode("utf-8")
+	return hashlib.sha256(blob).hexdigest()
+
+class BuildCache:
+	"""Manifest of {output name: key} stored alongside the outputs of one directory"""
+
+	def __init__(self, directory, force=False):
+		self.directory = directory
+		self.force = force
+		self.path = os.path.join(directory, MANIFEST_NAME)
+		self.entries = {}
+
+		if os.path.exists(self.path):
+			try:
+				with open(self.path, 'r') as f:
+					self.entries = json.load(f)
+			except (OSError, ValueError):
+				# A corrupt manifest only costs a rebuild
+				self.entries = {}
+
+	def is_fresh(self, name, key, outputs=None):
+		"""True if `name` was last built with `key` and all its output files still exist"""
+		if self.force or self.entries.get(name) != key:
+			return False
+		outputs = outputs or [os.path.join(self.directory, name)]
+		return all(os.path.exists(p) for p in outputs)
+
+	def record(self, name, key):
+		self.entries[name] = key
+
+	def forget(self, name):
+		self.entries.pop(name, None)
+
+	def save(self):
+		"""Write the manifest atomically"""
+		os.makedirs(self.directory, exist_ok=True)
+		# Unique per process, so two writers never rename each other's temp file away
+		tmp_path = f"{self.path}.{os.getpid()}.tmp"
+		with open(tmp_path, 'w') as f:
+			json.dump(self.entries, f, indent=2, sort_keys=True)
+		os.replace(tmp_path, self.path)
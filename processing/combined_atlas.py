@@ -0,0 +1,299 @@
+"""
+Combined atlas for every finger
+All fingers' dithered frames are decoded in parallel, trimmed to their alpha
+bounding box and bin-packed (MaxRects) onto one atlas, or onto several fixed
+size pages. A compact binary frame index goes alongside, so the game loads
+one index plus the pages and resolves any (finger, pose) with a single seek.
+
+Index layout (little endian):
+  header   "PDAI", version u8, page_count u8, finger_count u16, sprite_width u16, sprite_height u16
+  fingers  finger_count x (name 16s, first_record u16, pose_count u16)
+  records  one per (finger, pose), fingers in table order:
+           page u8, pad u8, x u16, y u16, w u16, h u16, trim_x u16, trim_y u16
+Record of (finger, pose) = records start + (first_record + pose) * 14.
+A fully transparent frame has w = h = 0.
+"""
+from PIL import Image
+import argparse
+import json
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+from atlas import pack_pages, pack_rects
+from build_cache import BuildCache, build_key
+from dither import available_cpus
+from pack_spritesheet import SHEET_FORMATS, dedupe_frames, fit_sprite, list_sprites, save_sheet, trim_sprite
+
+MAGIC = b"PDAI"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHHH")
+FINGER_ENTRY = struct.Struct("<16sHH")
+RECORD = struct.Struct("<BxHHHHHH")
+NAME_LENGTH = 16
+
+#-----Frames-----#
+def finger_dirs(input_dir, fingers=None):
+	"""(finger, directory) in `fingers` order, or every subdirectory holding dithered sprites"""
+	if fingers is None:
+		fingers = sorted(
+			name for name in os.listdir(input_dir)
+			if os.path.isdir(os.path.join(input_dir, name))
+			and any(f.endswith('_dithered.png') for f in os.listdir(os.path.join(input_dir, name)))
+		)
+	if not fingers:
+		raise ValueError(f"No finger directories found in {input_dir}")
+
+	return [(name, os.path.join(input_dir, name)) for name in fingers]
+
+def _decode(path, sprite_width, sprite_height):
+	img = Image.open(path)
+	img.load()
+	return fit_sprite(img, sprite_width, sprite_height).convert("RGBA")
+
+def load_fingers(dirs, sprite_width, sprite_height, workers=None):
+	"""
+	Decode every finger's sprites with a thread pool (PNG decoding releases the GIL).
+	Returns [(finger, files, images)] in `dirs` order.
+	"""
+	listed = [(name, directory, list_sprites(directory)) for name, directory in dirs]
+	paths = [os.path.join(directory, f) for _, directory, files in listed for f in files]
+
+	with ThreadPoolExecutor(max_workers=workers or available_cpus()) as pool:
+		decoded = iter(list(pool.map(lambda p: _decode(p, sprite_width, sprite_height), paths)))
+
+	return [(name, files, [next(decoded) for _ in files]) for name, _, files in listed]
+
+#-----Packing-----#
+def page_path(output_path, page, page_count):
+	"""Output path for one page: output_path itself for a single page, <stem>_<page><ext> otherwise"""
+	if page_count == 1:
+		return output_path
+	stem, ext = os.path.splitext(output_path)
+	return f"{stem}_{page}{ext}"
+
+def remove_stale_pages(output_path, page_count):
+	"""Delete pages left over from an earlier layout with a different page count"""
+	stale = [page_path(output_path, page, 2) for page in range(0xFF) if page_count == 1 or page >= page_count]
+	if page_count > 1:
+		stale.append(output_path)
+
+	for path in stale:
+		if os.path.exists(path):
+			os.remove(path)
+
+def index_path_for(output_path):
+	return os.path.splitext(output_path)[0] + '.pdai'
+
+def combined_metadata_path(output_path):
+	return os.path.splitext(output_path)[0] + '_metadata.json'
+
+def encode_index(fingers, records, page_count, sprite_width, sprite_height):
+	"""Binary frame index: fingers is [(name, pose_count)], records one (page, x, y, w, h, trim_x, trim_y) per frame"""
+	if page_count > 0xFF:
+		raise ValueError(f"The frame index holds at most 255 pages, got {page_count}")
+
+	out = bytearray(HEADER.pack(MAGIC, VERSION, page_count, len(fingers), sprite_width, sprite_height))
+	first = 0
+	for name, pose_count in fingers:
+		encoded = name.encode("utf-8")
+		if len(encoded) > NAME_LENGTH:
+			raise ValueError(f"Finger name '{name}' is longer than {NAME_LENGTH} bytes")
+		out += FINGER_ENTRY.pack(encoded, first, pose_count)
+		first += pose_count
+
+	for record in records:
+		out += RECORD.pack(*record)
+	return bytes(out)
+
+def pack_combined_atlas(dirs, output_path, sprite_width, sprite_height, page_size=None, sheet_format="png", mask=True,
+		dedupe=None, workers=None):
+	"""
+	Pack every finger's sprites into one atlas (page_size None: a single, smallest-fit atlas)
+	or into page_size x page_size pages, and write the binary frame index plus a metadata JSON.
+	With dedupe set, repeated frames share one rect, across fingers too. Returns the metadata.
+	"""
+	with tracing.span("decode", cat="pack"):
+		loaded = load_fingers(dirs, sprite_width, sprite_height, workers)
+
+	images = [img for _, _, finger_images in loaded for img in finger_images]
+	if dedupe is None:
+		unique, frame_cells = list(range(len(images))), list(range(len(images)))
+	else:
+		unique, frame_cells = dedupe_frames(images, dedupe)
+
+	trimmed = []
+	trims = []
+	for idx in unique:
+		img, trim = trim_sprite(images[idx])
+		trimmed.append(img)
+		trims.append(trim)
+	sizes = [img.size if img is not None else (0, 0) for img in trimmed]
+
+	if page_size is None:
+		width, height, positions = pack_rects(sizes)
+		page_sizes = [(width, height)]
+		placements = [(0, x, y) for x, y in positions]
+	else:
+		page_sizes, placements = pack_pages(sizes, page_size)
+		page_sizes = page_sizes or [(0, 0)]
+
+	pages = [Image.new('RGBA', (max(w, 1), max(h, 1)), (0, 0, 0, 0)) for w, h in page_sizes]
+	for img, (page, x, y) in zip(trimmed, placements):
+		if img is not None:
+			pages[page].paste(img, (x, y))
+
+	os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+	page_files = []
+	for page, sheet in enumerate(pages):
+		path = page_path(output_path, page, len(pages))
+		layout = save_sheet(sheet, path, {}, sheet_format, mask)
+		page_files.append(dict(file=os.path.basename(path), size=list(sheet.size), **layout))
+
+	records = []
+	fingers = {}
+	frame = 0
+	for name, files, _ in loaded:
+		entries = []
+		for filename in files:
+			cell = frame_cells[frame]
+			(page, x, y), (w, h), (trim_x, trim_y) = placements[cell], sizes[cell], trims[cell]
+			records.append((page, x, y, w, h, trim_x, trim_y))
+			entries.append({"file": filename, "page": page, "frame": [x, y, w, h], "trim": [trim_x, trim_y]})
+			frame += 1
+		fingers[name] = entries
+
+	with open(index_path_for(output_path), 'wb') as f:
+		f.write(encode_index([(name, len(files)) for name, files, _ in loaded], records, len(pages),
+			sprite_width, sprite_height))
+
+	metadata = {
+		"layout": "combined_atlas",
+		"sprite_count": len(images),
+		"cell_count": len(unique),
+		"sprite_size": [sprite_width, sprite_height],
+		"page_size": page_size,
+		"pages": page_files,
+		"index": os.path.basename(index_path_for(output_path)),
+		"fingers": fingers
+	}
+	with open(combined_metadata_path(output_path), 'w') as f:
+		json.dump(metadata, f, indent=2)
+
+	area = sum(w * h for w, h in page_sizes)
+	print(f"Packed {len(images)} sprites from {len(loaded)} fingers onto {len(pages)} page(s) ({len(unique)} unique)")
+	print(f"Atlas area: {area} px ({sprite_width * sprite_height * len(images) / max(area, 1):.1f}x smaller than the grids)")
+
+	return metadata
+
+#-----Index-----#
+class FrameIndex:
+	"""Reader for a .pdai frame index: constant-time (finger, pose) -> record lookups"""
+
+	def __init__(self, data):
+		magic, version, self.page_count, finger_count, width, height = HEADER.unpack_from(data, 0)
+		if magic != MAGIC:
+			raise ValueError("Not a combined atlas frame index (bad magic)")
+		if version != VERSION:
+			raise ValueError(f"Unsupported frame index version {version}")
+
+		self.data = data
+		self.sprite_size = (width, height)
+		self.records_start = HEADER.size + finger_count * FINGER_ENTRY.size
+		self.fingers = {}
+		for i in range(finger_count):
+			name, first, pose_count = FINGER_ENTRY.unpack_from(data, HEADER.size + i * FINGER_ENTRY.size)
+			self.fingers[name.rstrip(b"\0").decode("utf-8")] = (first, pose_count)
+
+	@classmethod
+	def open(cls, path):
+		with open(path, 'rb') as f:
+			return cls(f.read())
+
+	def lookup(self, finger, pose):
+		"""(page, x, y, w, h, trim_x, trim_y) of one frame"""
+		first, pose_count = self.fingers[finger]
+		if not 0 <= pose < pose_count:
+			raise IndexError(f"{finger} has {pose_count} poses, asked for {pose}")
+		return RECORD.unpack_from(self.data, self.records_start + (first + pose) * RECORD.size)
+
+	def frame(self, pages, finger, pose):
+		"""Rebuild the full-size RGBA frame from the page images"""
+		page, x, y, w, h, trim_x, trim_y = self.lookup(finger, pose)
+		frame = Image.new('RGBA', self.sprite_size, (0, 0, 0, 0))
+		if w and h:
+			frame.paste(pages[page].crop((x, y, x + w, y + h)), (trim_x, trim_y))
+		return frame
+
+#-----CLI-----#
+def main():
+	parser = argparse.ArgumentParser(description="Pack every finger's dithered frames into one atlas plus a binary frame index")
+	parser.add_argument("--input", required=True, help="Directory with one dithered subdirectory per finger")
+	parser.add_argument("--output", required=True, help="Atlas path (extra pages get _<n> suffixes)")
+	parser.add_argument("--fingers", default=None, help="Comma-separated finger order (default: every subdirectory, sorted)")
+	parser.add_argument("--width", type=int, default=300, help="Sprite width")
+	parser.add_argument("--height", type=int, default=200, help="Sprite height")
+	parser.add_argument("--page-size", type=int, default=None,
+		help="Pack onto square pages of this size (default: one smallest-fit atlas)")
+	parser.add_argument("--format", choices=SHEET_FORMATS, default="png",
+		help="png: RGBA pages; 1bit: packed Playdate-style 1bpp planes")
+	parser.add_argument("--no-mask", action="store_true", help="1bit format: omit the mask plane")
+	parser.add_argument("--dedupe", action="store_true", help="Store identical frames once, across fingers too")
+	parser.add_argument("--jobs", type=int, default=None, help="Decoding threads (default: number of available CPUs)")
+	parser.add_argument("--force", action="store_true", help="Repack even if inputs are unchanged")
+
+	args = parser.parse_args()
+	if args.page_size is not None and args.page_size < 1:
+		parser.error("--page-size must be at least 1")
+	if args.jobs is not None and args.jobs < 1:
+		parser.error("--jobs must be at least 1")
+
+	fingers = [name.strip() for name in args.fingers.split(",") if name.strip()] if args.fingers else None
+	dirs = finger_dirs(args.input, fingers)
+	mask = not args.no_mask
+	dedupe = 0 if args.dedupe else None
+
+	atlas_dir = os.path.dirname(os.path.abspath(args.output))
+	index_name = os.path.basename(index_path_for(args.output))
+	metadata_path = combined_metadata_path(args.output)
+
+	os.makedirs(atlas_dir, exist_ok=True)
+	cache = BuildCache(atlas_dir, force=args.force)
+	paths = [os.path.join(directory, f) for _, directory in dirs for f in list_sprites(directory)]
+	params = {
+		"fingers":   [name for name, _ in dirs],
+		"files":     [os.path.relpath(p, args.input) for p in paths],
+		"width":     args.width,
+		"height":    args.height,
+		"page_size": args.page_size,
+		"format":    args.format,
+		"mask":      mask,
+		"dedupe":    dedupe,
+	}
+	key = build_key(paths, params)
+
+	if os.path.exists(metadata_path):
+		with open(metadata_path, 'r') as f:
+			pages = [os.path.join(atlas_dir, page["file"]) for page in json.load(f).get("pages", [])]
+		if cache.is_fresh(index_name, key, [index_path_for(args.output), metadata_path] + pages):
+			print(f"Skipping {index_name} (unchanged)")
+			return
+
+	tracing.set_process_name("combined_atlas.py")
+
+	with tracing.span("pack_combined_atlas", cat="pack"):
+		metadata = pack_combined_atlas(dirs, args.output, args.width, args.height, args.page_size, args.format,
+			mask, dedupe, args.jobs)
+
+	remove_stale_pages(args.output, len(metadata["pages"]))
+
+	cache.record(index_name, key)
+	cache.save()
+	tracing.flush()
+
+	print(f"Frame index saved to {index_path_for(args.output)}")
+	print(f"Metadata saved to {metadata_path}")
+
+if __name__ == "__main__":
+	main()
@@ -1,7 +1,20 @@
 from PIL import Image
 import numpy as np
 import os
+import sys
 import argparse
+import hashlib
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import tracing
+from build_cache import BuildCache, build_key
+from threshold_maps import get_threshold_map, normalized
+from error_diffusion import KERNELS, error_diffusion_array
+from pack_spritesheet import list_sprites, metadata_path_for, pack_spritesheet, sheet_cache_key
+
+ALGORITHMS = ["ordered"] + list(KERNELS)
 
 #-----Bayer Matrices-----#
 BAYER_2x2 = np.array([
@@ -16,7 +29,71 @@ BAYER_4x4 = np.array([
 	[15,  7, 13,  5]
 ])
 
+#-----Threshold Maps-----#
+_threshold_cache = {}
+
+def threshold_map(bayer: np.ndarray, height: int, width: int, row_offset: int = 0) -> np.ndarray:
+	"""
+	Tile a rank matrix (Bayer, blue noise, ...) over a (height, width) frame as 0-255 thresholds.
+	row_offset shifts the pattern's phase for a band starting that many rows down the frame.
+	Maps are built once per matrix, shape and phase, then reused.
+	"""
+	t_h, t_w = bayer.shape
+	phase = row_offset % t_h
+
+	key = (bayer.shape, bayer.tobytes(), height, width, phase)
+	cached = _threshold_cache.get(key)
+	if cached is not None:
+		return cached
+
+	cell = normalized(bayer) * 255
+
+	reps = (-(-(height + phase) // t_h), -(-width // t_w))
+	tiled = np.tile(cell, reps)[phase:phase + height, :width]
+	tiled.flags.writeable = False
+
+	_threshold_cache[key] = tiled
+	return tiled
+
 #-----Dithering-----#
+def split_gray_alpha(image: Image.Image):
+	"""Return (grayscale, alpha) uint8 arrays for an image"""
+	image = image.convert("RGBA")
+	r, g, b, a = image.split()
+
+	gray = Image.merge("RGB", (r, g, b)).convert("L")
+	return np.array(gray, dtype=np.uint8), np.array(a, dtype=np.uint8)
+
+def dither_array(
+	pixels: np.ndarray,
+	alpha: np.ndarray,
+	bayer: np.ndarray,
+	black_cutoff: int,
+	white_cutoff: int,
+	row_offset: int = 0
+) -> np.ndarray:
+	"""
+	Dither grayscale pixels shaped (H, W) or stacked (N, H, W).
+	Returns a uint8 array of 0/255 values with the same shape.
+	row_offset is the first row's position in the full frame when dithering a band.
+	"""
+	h, w = pixels.shape[-2:]
+	thresholds = threshold_map(bayer, h, w, row_offset)
+
+	output = np.where(pixels > thresholds, 255, 0).astype(np.uint8)
+	output[pixels >= white_cutoff] = 255
+	output[pixels <= black_cutoff] = 0
+	output[alpha < 5] = 0
+
+	return output
+
+def _to_rgba(output: np.ndarray, alpha: np.ndarray) -> Image.Image:
+	result = Image.fromarray(output, mode="L")
+	return Image.merge(
+		"RGBA",
+		(result, result, result, Image.fromarray(alpha))
+	)
+
 def ordered_dither(
 	image: Image.Image,
 	bayer: np.ndarray,
@@ -24,79 +101,400 @@ def ordered_dither(
 	white_cutoff: int
 ) -> Image.Image:
 
-	image = image.convert("RGBA")
-	r, g, b, a = image.split()
+	pixels, alpha = split_gray_alpha(image)
+	output = dither_array(pixels, alpha, bayer, black_cutoff, white_cutoff)
 
-	gray = Image.merge("RGB", (r, g, b)).convert("L")
-	pixels = np.array(gray, dtype=np.float32)
-	alpha = np.array(a, dtype=np.uint8)
+	return _to_rgba(output, alpha)
 
-	h, w = pixels.shape
-	t_h, t_w = bayer.shape
-	matrix_size = t_h * t_w
+def ordered_dither_batch(
+	images,
+	bayer: np.ndarray,
+	black_cutoff: int,
+	white_cutoff: int
+) -> list:
+	"""Dither a list of same-size images as one (N, H, W) block"""
+	if not images:
+		return []
 
-	output = np.zeros((h, w), dtype=np.uint8)
+	planes = [split_gray_alpha(image) for image in images]
+	sizes = {p.shape for p, _ in planes}
+	if len(sizes) != 1:
+		raise ValueError(f"Batch frames must share one size, got {sorted(sizes)}")
 
-	for y in range(h):
-		for x in range(w):
-			if alpha[y, x] < 5:
-				continue
+	pixels = np.stack([p for p, _ in planes])
+	alpha = np.stack([a for _, a in planes])
+	output = dither_array(pixels, alpha, bayer, black_cutoff, white_cutoff)
 
-			pixel = pixels[y, x]
+	return [_to_rgba(output[i], alpha[i]) for i in range(len(images))]
 
-			if pixel <= black_cutoff:
-				continue
+def error_diffusion_dither(
+	image: Image.Image,
+	kernel_name: str,
+	black_cutoff: int,
+	white_cutoff: int,
+	serpentine: bool = False
+) -> Image.Image:
+
+	pixels, alpha = split_gray_alpha(image)
+	output = error_diffusion_array(pixels, alpha, kernel_name, black_cutoff, white_cutoff, serpentine)
+
+	return _to_rgba(output, alpha)
+
+def dither_image(image, bayer, black_cutoff, white_cutoff, algorithm="ordered", serpentine=False):
+	"""Dither with the named algorithm: "ordered" (uses bayer) or an error-diffusion kernel"""
+	if algorithm == "ordered":
+		return ordered_dither(image, bayer, black_cutoff, white_cutoff)
+	return error_diffusion_dither(image, algorithm, black_cutoff, white_cutoff, serpentine)
+
+#-----Files-----#
+def save_png(image, output_path):
+	"""Write a PNG through a temp file so a crash never leaves a partial output"""
+	tmp_path = output_path + ".tmp"
+	try:
+		image.save(tmp_path, format="PNG")
+		os.replace(tmp_path, output_path)
+	finally:
+		if os.path.exists(tmp_path):
+			os.remove(tmp_path)
+
+def dither_file(input_path, output_path, bayer, black_cutoff, white_cutoff, algorithm="ordered", serpentine=False):
+	"""
+	Dither one PNG, written atomically with save_png().
+	Returns seconds spent per stage: {"decode", "dither", "encode"}.
+	"""
+	filename = os.path.basename(input_path)
+
+	with tracing.span("decode", cat="dither", file=filename) as decode:
+		image = Image.open(input_path)
+		image.load()
+
+	with tracing.span("dither", cat="dither", file=filename) as dither:
+		dithered = dither_image(image, bayer, black_cutoff, white_cutoff, algorithm, serpentine)
+
+	with tracing.span("encode", cat="dither", file=filename) as encode:
+		save_png(dithered, output_path)
+
+	return {"decode": decode.seconds, "dither": dither.seconds, "encode": encode.seconds}
+
+def dithered_difference(path_a, path_b):
+	"""Fraction of pixels whose dithered value or visibility differs between two frames"""
+	gray_a, alpha_a = split_gray_alpha(Image.open(path_a))
+	gray_b, alpha_b = split_gray_alpha(Image.open(path_b))
+	if gray_a.shape != gray_b.shape:
+		return 1.0
+
+	changed = ((gray_a >= 128) != (gray_b >= 128)) | ((alpha_a >= 5) != (alpha_b >= 5))
+	return np.count_nonzero(changed) / changed.size
 
-			if pixel >= white_cutoff:
-				output[y, x] = 255
+def dither_cache_params(bayer, black_cutoff, white_cutoff, algorithm="ordered", serpentine=False):
+	"""Parameters a dithered output's build-cache key depends on"""
+	return {
+		"algorithm":    algorithm,
+		"serpentine":   serpentine,
+		"matrix":       [list(bayer.shape), hashlib.sha1(np.ascontiguousarray(bayer).tobytes()).hexdigest()],
+		"black_cutoff": black_cutoff,
+		"white_cutoff": white_cutoff,
+	}
+
+def _dither_job(job):
+	"""Pool worker: returns (filename, error message or None, trace events)"""
+	filename, input_path, output_path, bayer, black_cutoff, white_cutoff, algorithm, serpentine = job
+	try:
+		dither_file(input_path, output_path, bayer, black_cutoff, white_cutoff, algorithm, serpentine)
+		return filename, None, tracing.drain()
+	except Exception as e:
+		return filename, f"{type(e).__name__}: {e}", tracing.drain()
+
+def available_cpus():
+	"""Number of CPUs this process may run on"""
+	try:
+		return len(os.sched_getaffinity(0))
+	except AttributeError:
+		return os.cpu_count() or 1
+
+def dither_directory(input_dir, output_dir, bayer, black_cutoff, white_cutoff, jobs=None, force=False,
+		algorithm="ordered", serpentine=False):
+	"""
+	Dither every PNG in input_dir, spreading files over `jobs` processes.
+	Files whose content and parameters match the build manifest are skipped unless `force`.
+	Results are reported in sorted filename order. Returns {filename: error} for failures.
+	"""
+	os.makedirs(output_dir, exist_ok=True)
+
+	cache = BuildCache(output_dir, force=force)
+	params = dither_cache_params(bayer, black_cutoff, white_cutoff, algorithm, serpentine)
+
+	work = []
+	keys = {}
+	for filename in sorted(os.listdir(input_dir)):
+		if not filename.lower().endswith(".png"):
+			continue
+
+		input_path = os.path.join(input_dir, filename)
+		output_name = filename.replace(".png", "_dithered.png")
+		output_path = os.path.join(output_dir, output_name)
+
+		key = build_key([input_path], params)
+		if cache.is_fresh(output_name, key):
+			print(f"Skipping {filename} (unchanged)")
+			continue
+
+		keys[filename] = (output_name, key)
+		work.append((filename, input_path, output_path, bayer, black_cutoff, white_cutoff, algorithm, serpentine))
+
+	jobs = min(jobs or available_cpus(), len(work))
+
+	if jobs <= 1:
+		results = map(_dither_job, work)
+	else:
+		pool = ProcessPoolExecutor(max_workers=jobs)
+		results = pool.map(_dither_job, work)
+
+	failures = {}
+	try:
+		for filename, error, events in results:
+			tracing.add_events(events)
+			output_name, key = keys[filename]
+			if error is None:
+				print(f"Dithering {filename}")
+				cache.record(output_name, key)
+			else:
+				print(f"FAILED {filename}: {error}", file=sys.stderr)
+				cache.forget(output_name)
+				failures[filename] = error
+	finally:
+		if jobs > 1:
+			pool.shutdown()
+		cache.save()
+
+	return failures
+
+#-----Watch Mode-----#
+WATCH_ATTEMPTS = 3   # failed decodes of an unchanged file before it is reported
+
+def scan_pngs(input_dir):
+	"""{relative path: (mtime_ns, size)} for every PNG under input_dir, hidden directories excluded"""
+	found = {}
+	for root, dirs, files in os.walk(input_dir):
+		dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+		for filename in files:
+			if filename.lower().endswith(".png"):
+				path = os.path.join(root, filename)
+				try:
+					stat = os.stat(path)
+				except FileNotFoundError:
+					continue
+				found[os.path.relpath(path, input_dir)] = (stat.st_mtime_ns, stat.st_size)
+	return found
+
+class FrameWatcher:
+	"""
+	Polling change detector for a tree of PNGs (no OS-specific watcher needed).
+	A new or modified file is reported once its mtime and size have stayed the
+	same for `settle` seconds, so frames still being written are left alone.
+	"""
+
+	def __init__(self, input_dir, settle=0.25):
+		self.input_dir = input_dir
+		self.settle = settle
+		self.seen = {}       # relative path -> signature already handled
+		self.pending = {}    # relative path -> (signature, time it was first seen)
+		self.attempts = {}   # relative path -> (signature, failed attempts)
+
+	def poll(self, now=None):
+		"""Relative paths of files that changed and have settled, sorted"""
+		now = time.monotonic() if now is None else now
+		current = scan_pngs(self.input_dir)
+
+		for rel in list(self.seen):
+			if rel not in current:
+				del self.seen[rel]
+		for rel in list(self.pending):
+			if rel not in current:
+				del self.pending[rel]
+
+		ready = []
+		for rel, signature in current.items():
+			if self.seen.get(rel) == signature:
 				continue
 
-			threshold = bayer[y % t_h, x % t_w]
-			threshold_value = (threshold + 0.5) / matrix_size * 255
+			pending = self.pending.get(rel)
+			if pending is None or pending[0] != signature:
+				self.pending[rel] = (signature, now)
+			elif now - pending[1] >= self.settle:
+				ready.append(rel)
 
-			output[y, x] = 255 if pixel > threshold_value else 0
+		return sorted(ready)
 
-	result = Image.fromarray(output, mode="L")
-	result = Image.merge(
-		"RGBA",
-		(result, result, result, Image.fromarray(alpha))
-	)
+	def done(self, rel):
+		"""Mark a file as handled at the signature it settled with"""
+		signature, _ = self.pending.pop(rel)
+		self.attempts.pop(rel, None)
+		self.seen[rel] = signature
+
+	def failed(self, rel):
+		"""Count a failed attempt at a file's current signature; returns the attempts so far"""
+		signature, _ = self.pending[rel]
+		attempts = self.attempts.get(rel, (None, 0))
+		count = attempts[1] + 1 if attempts[0] == signature else 1
+		self.attempts[rel] = (signature, count)
+		return count
+
+def repack_sheet(dithered_dir, sheet_path, sprite_width, sprite_height, columns):
+	"""Re-pack one finger's sheet, as pack_spritesheet.py would, and record it in the sheet cache"""
+	files = list_sprites(dithered_dir)
+	sheet_dir = os.path.dirname(os.path.abspath(sheet_path))
+	os.makedirs(sheet_dir, exist_ok=True)
+
+	metadata = pack_spritesheet(dithered_dir, sheet_path, sprite_width, sprite_height, columns)
+	with open(metadata_path_for(sheet_path), 'w') as f:
+		json.dump(metadata, f, indent=2)
+
+	cache = BuildCache(sheet_dir)
+	cache.record(os.path.basename(sheet_path), sheet_cache_key(dithered_dir, files, sprite_width, sprite_height, columns))
+	cache.save()
+
+def watch_directory(input_dir, output_dir, bayer, black_cutoff, white_cutoff, algorithm="ordered", serpentine=False,
+		interval=0.5, settle=0.25, pack_dir=None, sprite_width=300, sprite_height=200, columns=4):
+	"""
+	Keep dithering PNGs under input_dir as they appear or change, until interrupted.
+	Subdirectories (e.g. output/raw/<finger>) are mirrored under output_dir.
+	With pack_dir set, every output directory that changed is re-packed into
+	pack_dir/<directory name>_sheet.png after each batch.
+	"""
+	watcher = FrameWatcher(input_dir, settle)
+	params = dither_cache_params(bayer, black_cutoff, white_cutoff, algorithm, serpentine)
+	caches = {}
+
+	print(f"Watching {input_dir} (Ctrl+C to stop)")
+	try:
+		while True:
+			changed_dirs = set()
+
+			for rel in watcher.poll():
+				input_path = os.path.join(input_dir, rel)
+				target_dir = os.path.join(output_dir, os.path.dirname(rel))
+				output_name = os.path.basename(rel).replace(".png", "_dithered.png")
+
+				cache = caches.get(target_dir)
+				if cache is None:
+					os.makedirs(target_dir, exist_ok=True)
+					cache = caches[target_dir] = BuildCache(target_dir)
+
+				key = build_key([input_path], params)
+				if cache.is_fresh(output_name, key):
+					watcher.done(rel)
+					continue
 
-	return result
+				start = time.perf_counter()
+				try:
+					dither_file(input_path, os.path.join(target_dir, output_name), bayer, black_cutoff, white_cutoff,
+						algorithm, serpentine)
+				except FileNotFoundError:
+					continue
+				except (OSError, SyntaxError, ValueError) as e:
+					# A file can look settled and still be half-written; give it a few more polls
+					if watcher.failed(rel) < WATCH_ATTEMPTS:
+						continue
+					print(f"FAILED {rel}: {type(e).__name__}: {e}", file=sys.stderr)
+					cache.forget(output_name)
+					watcher.done(rel)
+					continue
+
+				cache.record(output_name, key)
+				cache.save()
+				watcher.done(rel)
+				changed_dirs.add(target_dir)
+				print(f"Dithered {rel} in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+			if pack_dir is not None:
+				for target_dir in sorted(changed_dirs):
+					sheet_name = os.path.basename(os.path.normpath(target_dir))
+					sheet_path = os.path.join(pack_dir, f"{sheet_name}_sheet.png")
+					start = time.perf_counter()
+					with tracing.span("pack", cat="pack", sheet=sheet_name):
+						repack_sheet(target_dir, sheet_path, sprite_width, sprite_height, columns)
+					print(f"Repacked {sheet_path} in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+			time.sleep(interval)
+	except KeyboardInterrupt:
+		print("Stopped watching")
 
 #-----CLI-----#
 def main():
-	parser = argparse.ArgumentParser(description="Ordered dithering for RGBA images")
+	parser = argparse.ArgumentParser(description="Ordered and error-diffusion dithering for RGBA images")
 	parser.add_argument("--input", required=True, help="Input directory")
 	parser.add_argument("--output", required=True, help="Output directory")
-	parser.add_argument("--matrix", type=int, choices=[2, 4], default=4)
+	parser.add_argument("--matrix", default="4",
+		help="Threshold map: Bayer size (2, 4, 8, 16, ...) or a name like bayer8, bluenoise64, bluenoise64:3")
+	parser.add_argument("--algorithm", choices=ALGORITHMS, default="ordered",
+		help="ordered (threshold map from --matrix) or an error-diffusion kernel")
+	parser.add_argument("--serpentine", action="store_true",
+		help="Error diffusion: alternate scan direction on every row")
 	parser.add_argument("--black-cutoff", type=int, default=10)
 	parser.add_argument("--white-cutoff", type=int, default=170)
+	parser.add_argument("--jobs", type=int, default=None,
+		help="Worker processes (default: number of available CPUs)")
+	parser.add_argument("--force", action="store_true",
+		help="Re-dither every file, ignoring the build cache")
+	parser.add_argument("--watch", action="store_true",
+		help="Stay running and re-dither PNGs under --input (including subdirectories) as they change")
+	parser.add_argument("--interval", type=float, default=0.5, help="--watch: seconds between polls")
+	parser.add_argument("--settle", type=float, default=0.25,
+		help="--watch: seconds a file's mtime and size must stay unchanged before it is dithered")
+	parser.add_argument("--pack", default=None,
+		help="--watch: re-pack each changed output directory into PACK/<name>_sheet.png")
+	parser.add_argument("--sprite-width", type=int, default=300, help="--pack: sprite width")
+	parser.add_argument("--sprite-height", type=int, default=200, help="--pack: sprite height")
+	parser.add_argument("--columns", type=int, default=4, help="--pack: columns in sheet")
 
 	args = parser.parse_args()
 
-	bayer = BAYER_2x2 if args.matrix == 2 else BAYER_4x4
-
-	os.makedirs(args.output, exist_ok=True)
-
-	for filename in sorted(os.listdir(args.input)):
-		if not filename.lower().endswith(".png"):
-			continue
+	if args.jobs is not None and args.jobs < 1:
+		parser.error("--jobs must be at least 1")
 
-		input_path = os.path.join(args.input, filename)
-		output_name = filename.replace(".png", "_dithered.png")
-		output_path = os.path.join(args.output, output_name)
+	try:
+		bayer = get_threshold_map(args.matrix)
+	except ValueError as e:
+		parser.error(str(e))
 
-		print(f"Dithering {filename}")
+	tracing.set_process_name("dither.py")
 
-		image = Image.open(input_path)
-		dithered = ordered_dither(
-			image,
+	if args.watch:
+		watch_directory(
+			args.input,
+			args.output,
 			bayer,
 			args.black_cutoff,
-			args.white_cutoff
+			args.white_cutoff,
+			algorithm=args.algorithm,
+			serpentine=args.serpentine,
+			interval=args.interval,
+			settle=args.settle,
+			pack_dir=args.pack,
+			sprite_width=args.sprite_width,
+			sprite_height=args.sprite_height,
+			columns=args.columns
 		)
-		dithered.save(output_path)
+		tracing.flush()
+		return
+
+	failures = dither_directory(
+		args.input,
+		args.output,
+		bayer,
+		args.black_cutoff,
+		args.white_cutoff,
+		jobs=args.jobs,
+		force=args.force,
+		algorithm=args.algorithm,
+		serpentine=args.serpentine
+	)
+	tracing.flush()
+
+	if failures:
+		print(f"Dithering failed for {len(failures)} file(s): {', '.join(sorted(failures))}", file=sys.stderr)
+		sys.exit(1)
 
 	print("Dithering complete")
 
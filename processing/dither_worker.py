@@ -0,0 +1,265 @@
+"""
+Long-lived dither worker, fed one frame at a time while Blender keeps rendering.
+
+Protocol: one JSON object per line. Requests go to the worker's stdin,
+replies come back on its stdout in the same order.
+
+  {"op": "dither", "id": 3, "input": "...png", "output": "..._dithered.png",
+   "matrix": 4 | "bayer8" | "bluenoise64", "black_cutoff": 10, "white_cutoff": 170,
+   "algorithm": "ordered" | "floyd-steinberg" | ..., "serpentine": false, "force": false}
+      -> {"id": 3, "ok": true, "skipped": false,
+          "timing": {"decode": 0.004, "dither": 0.001, "encode": 0.006}}
+      -> {"id": 3, "ok": false, "error": "OSError: ..."}
+  {"op": "diff", "id": 4, "a": "..._dithered.png", "b": "..._dithered.png"}
+      -> {"id": 4, "ok": true, "difference": 0.031}   (fraction of pixels that changed)
+  {"op": "remove", "id": 5, "paths": ["..._dithered.png", ...]}
+      -> {"id": 5, "ok": true, "removed": 2}   (deleted and dropped from their build manifest)
+  {"op": "ping", "id": 6}  -> {"id": 6, "ok": true}
+  {"op": "shutdown"}       -> worker exits
+
+The client side (DitherWorker) only uses the standard library, so it can be
+imported from Blender's bundled Python; NumPy and PIL are loaded in the worker.
+"""
+import json
+import os
+import subprocess
+import sys
+import threading
+
+WORKER_SCRIPT = os.path.abspath(__file__)
+
+#-----Worker-----#
+def _cache_for(output_dir, caches):
+	"""One BuildCache per output directory, shared by every request to it"""
+	from build_cache import BuildCache
+
+	cache = caches.get(output_dir)
+	if cache is None:
+		cache = caches[output_dir] = BuildCache(output_dir)
+	return cache
+
+def remove_outputs(paths, caches):
+	"""Delete dithered outputs and forget them in their directory's manifest; returns how many existed"""
+	removed = 0
+	touched = {}
+	for path in paths:
+		output_dir = os.path.dirname(os.path.abspath(path))
+		cache = touched[output_dir] = _cache_for(output_dir, caches)
+		cache.forget(os.path.basename(path))
+		if os.path.exists(path):
+			os.remove(path)
+			removed += 1
+
+	for cache in touched.values():
+		cache.save()
+	return removed
+
+def handle_request(request, caches):
+	"""Process one protocol request and return its reply"""
+	from build_cache import build_key
+	from dither import dither_cache_params, dither_file, dithered_difference
+	from threshold_maps import get_threshold_map
+
+	op = request.get("op")
+	reply = {"id": request.get("id")}
+
+	if op == "ping":
+		reply["ok"] = True
+		return reply
+
+	if op == "diff":
+		try:
+			reply.update(ok=True, difference=dithered_difference(request["a"], request["b"]))
+		except Exception as e:
+			reply.update(ok=False, error=f"{type(e).__name__}: {e}")
+		return reply
+
+	if op == "remove":
+		try:
+			reply.update(ok=True, removed=remove_outputs(request["paths"], caches))
+		except Exception as e:
+			reply.update(ok=False, error=f"{type(e).__name__}: {e}")
+		return reply
+
+	if op != "dither":
+		reply.update(ok=False, error=f"Unknown op {op!r}")
+		return reply
+
+	try:
+		input_path = request["input"]
+		output_path = request["output"]
+		bayer = get_threshold_map(request["matrix"])
+		algorithm = request.get("algorithm", "ordered")
+		serpentine = request.get("serpentine", False)
+		params = dither_cache_params(bayer, request["black_cutoff"], request["white_cutoff"], algorithm, serpentine)
+
+		output_dir = os.path.dirname(os.path.abspath(output_path))
+		output_name = os.path.basename(output_path)
+		os.makedirs(output_dir, exist_ok=True)
+
+		cache = _cache_for(output_dir, caches)
+
+		key = build_key([input_path], params)
+		if not request.get("force") and cache.is_fresh(output_name, key):
+			reply.update(ok=True, skipped=True)
+			return reply
+
+		timing = dither_file(
+			input_path, output_path, bayer,
+			request["black_cutoff"], request["white_cutoff"],
+			algorithm, serpentine
+		)
+		cache.record(output_name, key)
+		cache.save()
+		reply.update(ok=True, skipped=False, timing=timing)
+	except Exception as e:
+		reply.update(ok=False, error=f"{type(e).__name__}: {e}")
+
+	return reply
+
+def serve(stdin=None, stdout=None):
+	"""Answer requests line by line until shutdown or end of input"""
+	import tracing
+	tracing.set_process_name("dither worker")
+
+	stdin = stdin or sys.stdin
+	stdout = stdout or sys.stdout
+
+	# Stray prints must not corrupt the protocol stream
+	sys.stdout = sys.stderr
+
+	caches = {}
+	for line in stdin:
+		line = line.strip()
+		if not line:
+			continue
+
+		try:
+			request = json.loads(line)
+		except ValueError as e:
+			reply = {"id": None, "ok": False, "error": f"Bad request: {e}"}
+		else:
+			if request.get("op") == "shutdown":
+				break
+			reply = handle_request(request, caches)
+
+		stdout.write(json.dumps(reply) + "\n")
+		stdout.flush()
+
+	tracing.flush()
+
+#-----Client-----#
+class DitherWorker:
+	"""Spawn a dither worker process and exchange protocol messages with it"""
+
+	def __init__(self, python="python3"):
+		self.proc = subprocess.Popen(
+			[python, WORKER_SCRIPT],
+			stdin=subprocess.PIPE,
+			stdout=subprocess.PIPE,
+			text=True,
+			bufsize=1
+		)
+		self._next_id = 0
+		self._replies = {}
+		self._closed = False
+		self._cond = threading.Condition()
+		self._send_lock = threading.Lock()
+
+		self._reader = threading.Thread(target=self._read_replies, daemon=True)
+		self._reader.start()
+
+	def _read_replies(self):
+		for line in self.proc.stdout:
+			try:
+				reply = json.loads(line)
+			except ValueError:
+				continue
+			with self._cond:
+				self._replies[reply.get("id")] = reply
+				self._cond.notify_all()
+
+		with self._cond:
+			self._closed = True
+			self._cond.notify_all()
+
+	def _send(self, request):
+		# Held across the write so concurrent senders never interleave lines. A separate
+		# lock from _cond: the reader must still be able to take replies while a write blocks
+		with self._send_lock:
+			ticket = self._next_id
+			self._next_id += 1
+
+			request["id"] = ticket
+			try:
+				self.proc.stdin.write(json.dumps(request) + "\n")
+				self.proc.stdin.flush()
+			except (BrokenPipeError, OSError) as e:
+				raise RuntimeError(f"Dither worker is not running: {e}")
+		return ticket
+
+	def submit(self, input_path, output_path, matrix, black_cutoff, white_cutoff, force=False,
+			algorithm="ordered", serpentine=False):
+		"""Queue a frame for dithering. Returns a ticket to wait on; does not block."""
+		return self._send({
+			"op":           "dither",
+			"input":        input_path,
+			"output":       output_path,
+			"matrix":       matrix,
+			"black_cutoff": black_cutoff,
+			"white_cutoff": white_cutoff,
+			"algorithm":    algorithm,
+			"serpentine":   serpentine,
+			"force":        force,
+		})
+
+	def difference(self, path_a, path_b):
+		"""Fraction of pixels that differ between two dithered frames (blocks)"""
+		reply = self.wait(self._send({"op": "diff", "a": path_a, "b": path_b}))
+		if not reply["ok"]:
+			raise RuntimeError(f"Frame comparison failed: {reply['error']}")
+		return reply["difference"]
+
+	def remove(self, paths):
+		"""Delete outputs through the worker, so it stays the only writer of their manifest (blocks)"""
+		reply = self.wait(self._send({"op": "remove", "paths": list(paths)}))
+		if not reply["ok"]:
+			raise RuntimeError(f"Removing stale frames failed: {reply['error']}")
+		return reply["removed"]
+
+	def ping(self):
+		return self.wait(self._send({"op": "ping"}))
+
+	def wait(self, ticket, timeout=None):
+		"""Block until the reply for `ticket` arrives and return it"""
+		with self._cond:
+			done = self._cond.wait_for(
+				lambda: ticket in self._replies or self._closed,
+				timeout=timeout
+			)
+			if ticket in self._replies:
+				return self._replies.pop(ticket)
+
+		if not done:
+			raise TimeoutError(f"Dither worker did not answer request {ticket}")
+		raise RuntimeError(f"Dither worker exited with code {self.proc.poll()} before answering request {ticket}")
+
+	def close(self):
+		"""Ask the worker to finish and wait for it"""
+		if self.proc.poll() is None:
+			try:
+				self.proc.stdin.write(json.dumps({"op": "shutdown"}) + "\n")
+				self.proc.stdin.close()
+			except (BrokenPipeError, OSError):
+				pass
+			self.proc.wait()
+		self._reader.join()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+if __name__ == "__main__":
+	serve()
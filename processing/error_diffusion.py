@@ -0,0 +1,119 @@
+"""
+Streaming error-diffusion dithering (Floyd-Steinberg, Atkinson, Sierra)
+Rows are consumed and produced one at a time; only the rows the kernel
+reaches into are kept as error buffers, so memory is O(width) whatever the
+image height. Follows the same zones as ordered dithering: alpha < 5 is
+skipped, pixels at or below black_cutoff / at or above white_cutoff are
+forced to black / white, and only the midtones carry error.
+"""
+import numpy as np
+
+#-----Kernels-----#
+# (dx, dy, weight) offsets from the current pixel, for a left-to-right scan
+KERNELS = {
+	"floyd-steinberg": [
+		(1, 0, 7 / 16),
+		(-1, 1, 3 / 16), (0, 1, 5 / 16), (1, 1, 1 / 16),
+	],
+	"atkinson": [
+		(1, 0, 1 / 8), (2, 0, 1 / 8),
+		(-1, 1, 1 / 8), (0, 1, 1 / 8), (1, 1, 1 / 8),
+		(0, 2, 1 / 8),
+	],
+	"sierra": [
+		(1, 0, 5 / 32), (2, 0, 3 / 32),
+		(-2, 1, 2 / 32), (-1, 1, 4 / 32), (0, 1, 5 / 32), (1, 1, 4 / 32), (2, 1, 2 / 32),
+		(-1, 2, 2 / 32), (0, 2, 3 / 32), (1, 2, 2 / 32),
+	],
+	"sierra-lite": [
+		(1, 0, 2 / 4),
+		(-1, 1, 1 / 4), (0, 1, 1 / 4),
+	],
+}
+
+MIDPOINT = 128
+PAD = 2     # widest horizontal reach of any kernel
+
+#-----Engine-----#
+def diffuse_rows(rows, width, kernel, black_cutoff, white_cutoff, serpentine=False):
+	"""
+	Generator: consume (gray_row, alpha_row) pairs and yield uint8 output rows.
+	Only max(dy) + 1 error rows of width + 2 * PAD floats are ever held.
+	"""
+	depth = max(dy for _, dy, _ in kernel) + 1
+	# Forward and mirrored kernels, split per target row for the inner loop
+	forward = [[(dx, w) for dx, dy, w in kernel if dy == d] for d in range(depth)]
+	mirrored = [[(-dx, w) for dx, w in row] for row in forward]
+
+	errors = [[0.0] * (width + 2 * PAD) for _ in range(depth)]
+
+	for y, (gray_row, alpha_row) in enumerate(rows):
+		gray = gray_row.tolist()
+		alpha = alpha_row.tolist()
+		out = bytearray(width)
+
+		reverse = serpentine and y % 2 == 1
+		taps = mirrored if reverse else forward
+		xs = range(width - 1, -1, -1) if reverse else range(width)
+
+		current = errors[0]
+		below = errors[1:]
+		same_taps = taps[0]
+		below_taps = list(zip(below, taps[1:]))
+
+		for x in xs:
+			if alpha[x] < 5:
+				continue
+
+			pixel = gray[x]
+			if pixel <= black_cutoff:
+				continue
+			if pixel >= white_cutoff:
+				out[x] = 255
+				continue
+
+			value = pixel + current[x + PAD]
+			if value >= MIDPOINT:
+				out[x] = 255
+				err = value - 255
+			else:
+				err = value
+
+			i = x + PAD
+			for dx, w in same_taps:
+				current[i + dx] += err * w
+			for row, row_taps in below_taps:
+				for dx, w in row_taps:
+					row[i + dx] += err * w
+
+		# Rotate the buffers: the next row's errors become current
+		errors = below + [current]
+		for i in range(len(current)):
+			current[i] = 0.0
+
+		yield np.frombuffer(bytes(out), dtype=np.uint8)
+
+def error_diffusion_array(
+	pixels: np.ndarray,
+	alpha: np.ndarray,
+	kernel_name: str,
+	black_cutoff: int,
+	white_cutoff: int,
+	serpentine: bool = False
+) -> np.ndarray:
+	"""Dither (H, W) grayscale pixels; returns a uint8 array of 0/255 values"""
+	kernel = get_kernel(kernel_name)
+	h, w = pixels.shape
+	output = np.empty((h, w), dtype=np.uint8)
+
+	rows = zip(pixels, alpha)
+	for y, row in enumerate(diffuse_rows(rows, w, kernel, black_cutoff, white_cutoff, serpentine)):
+		output[y] = row
+
+	return output
+
+def get_kernel(name):
+	kernel = KERNELS.get(name)
+	if kernel is None:
+		raise ValueError(f"Unknown error-diffusion kernel '{name}'. Available: {list(KERNELS)}")
+	return kernel
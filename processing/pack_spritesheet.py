@@ -3,21 +3,135 @@ Pack dithered finger sprites into Playdate-compatible sprite sheets
 Playdate specs: any size, but commonly 16x16, 32x32, or 64x64 per frame
 """
 from PIL import Image
+import numpy as np
+import hashlib
 import os
 import json
 import argparse
 
-def pack_spritesheet(input_dir, output_path, sprite_width, sprite_height, columns):
-	"""Pack individual sprites into a sprite sheet"""
-	
-	# Get all PNG files
+import tracing
+from build_cache import BuildCache, build_key
+from playdate_bitmap import write_1bit_sheet
+from atlas import pack_rects
+
+SHEET_FORMATS = ["png", "1bit"]
+SHEET_LAYOUTS = ["grid", "atlas"]
+
+def list_sprites(input_dir):
+	"""Sorted dithered sprite filenames in a directory"""
 	files = sorted([f for f in os.listdir(input_dir) if f.endswith('_dithered.png')])
 	
 	if not files:
 		raise ValueError(f"No dithered images found in {input_dir}")
 	
+	return files
+
+def sheet_cache_key(input_dir, files, sprite_width, sprite_height, columns, sheet_format="png", mask=True,
+		layout="grid", max_size=None, dedupe=None):
+	"""Build-cache key for a sheet: ordered input contents plus layout parameters"""
+	params = {
+		"width":    sprite_width,
+		"height":   sprite_height,
+		"columns":  columns,
+		"files":    files,
+		"format":   sheet_format,
+		"mask":     mask,
+		"layout":   layout,
+		"max_size": max_size,
+		"dedupe":   dedupe,
+	}
+	return build_key([os.path.join(input_dir, f) for f in files], params)
+
+def metadata_path_for(output_path):
+	"""index_sheet.png -> index_sheet_metadata.json; other formats keep their extension (index_sheet_bin_metadata.json)"""
+	stem, ext = os.path.splitext(output_path)
+	if ext and ext.lower() != ".png":
+		stem += "_" + ext[1:]
+	return stem + '_metadata.json'
+
+def fit_sprite(img, sprite_width, sprite_height):
+	"""Resize a sprite to the configured frame size if needed"""
+	if img.size != (sprite_width, sprite_height):
+		img = img.resize((sprite_width, sprite_height), Image.NEAREST)
+	
+	return img
+
+def load_sprite(input_dir, filename, sprite_width, sprite_height):
+	"""Open a sprite, resized to the configured frame size if needed"""
+	return fit_sprite(Image.open(os.path.join(input_dir, filename)), sprite_width, sprite_height)
+
+def save_sheet(sheet, output_path, metadata, sheet_format="png", mask=True):
+	"""Write a sheet image in the requested format, recording it in the metadata"""
+	metadata["format"] = sheet_format
+	
+	if sheet_format == "1bit":
+		metadata["bitmap"] = write_1bit_sheet(sheet, output_path, with_mask=mask)
+	elif sheet_format == "png":
+		sheet.save(output_path)
+	else:
+		raise ValueError(f"Unknown sheet format '{sheet_format}'. Available: {SHEET_FORMATS}")
+	
+	return metadata
+
+def dedupe_frames(images, tolerance=0):
+	"""
+	Find frames that can share one sheet cell.
+	Frames are identical when their RGBA pixels hash the same; with tolerance K a frame
+	also merges into an earlier unique frame that differs in at most K pixels.
+	Returns (unique frame indices, cell index for every logical frame).
+	"""
+	unique = []
+	unique_pixels = []
+	by_hash = {}
+	frame_cells = []
+	
+	for idx, img in enumerate(images):
+		pixels = np.asarray(img.convert("RGBA"))
+		digest = hashlib.sha1(pixels.tobytes()).hexdigest()
+		cell = by_hash.get((pixels.shape, digest))
+		
+		if cell is None and tolerance:
+			for candidate, other in enumerate(unique_pixels):
+				if other.shape == pixels.shape and np.count_nonzero((other != pixels).any(axis=-1)) <= tolerance:
+					cell = candidate
+					break
+		
+		if cell is None:
+			cell = len(unique)
+			unique.append(idx)
+			unique_pixels.append(pixels)
+			by_hash[(pixels.shape, digest)] = cell
+		
+		frame_cells.append(cell)
+	
+	return unique, frame_cells
+
+def pack_spritesheet(input_dir, output_path, sprite_width, sprite_height, columns, sheet_format="png", mask=True,
+		dedupe=None):
+	"""
+	Pack individual sprites into a sprite sheet.
+	sheet_format "png" writes an RGBA PNG; "1bit" writes packed 1bpp planes
+	(plus a mask plane unless mask=False) described by the returned "bitmap" layout.
+	With dedupe set to a pixel tolerance (0 = exact), repeated frames share one cell;
+	metadata "frame_cells" maps each logical frame in "files" to its cell.
+	"""
+	
+	# Get all PNG files
+	files = list_sprites(input_dir)
+	images = [load_sprite(input_dir, filename, sprite_width, sprite_height) for filename in files]
+	
+	return pack_grid_images(files, images, output_path, sprite_width, sprite_height, columns, sheet_format, mask, dedupe)
+
+def pack_grid_images(files, images, output_path, sprite_width, sprite_height, columns, sheet_format="png", mask=True,
+		dedupe=None):
+	"""pack_spritesheet for frames already in memory: `images` are sprite-sized, in `files` order"""
+	if dedupe is None:
+		unique, frame_cells = list(range(len(files))), list(range(len(files)))
+	else:
+		unique, frame_cells = dedupe_frames(images, dedupe)
+	
 	# Calculate sheet dimensions
-	rows = (len(files) + columns - 1) // columns
+	rows = (len(unique) + columns - 1) // columns
 	sheet_width = sprite_width * columns
 	sheet_height = sprite_height * rows
 	
@@ -25,31 +139,114 @@ def pack_spritesheet(input_dir, output_path, sprite_width, sprite_height, column
 	sheet = Image.new('RGBA', (sheet_width, sheet_height), (0, 0, 0, 0))
 	
 	# Paste sprites
-	for idx, filename in enumerate(files):
-		img = Image.open(os.path.join(input_dir, filename))
-		
-		# Resize if needed
-		if img.size != (sprite_width, sprite_height):
-			img = img.resize((sprite_width, sprite_height), Image.NEAREST)
-		
-		col = idx % columns
-		row = idx // columns
+	for cell, idx in enumerate(unique):
+		col = cell % columns
+		row = cell // columns
 		x = col * sprite_width
 		y = row * sprite_height
 		
-		sheet.paste(img, (x, y))
-	
-	sheet.save(output_path)
-	print(f"Packed {len(files)} sprites into {output_path}")
-	print(f"Sheet size: {sheet_width}x{sheet_height} ({columns}x{rows} grid)")
+		sheet.paste(images[idx], (x, y))
 	
-	return {
+	metadata = {
+		"layout": "grid",
 		"sprite_count": len(files),
+		"cell_count": len(unique),
 		"sprite_size": [sprite_width, sprite_height],
 		"sheet_size": [sheet_width, sheet_height],
 		"grid": [columns, rows],
-		"files": files
+		"files": files,
+		"frame_cells": frame_cells
+	}
+	save_sheet(sheet, output_path, metadata, sheet_format, mask)
+	
+	print(f"Packed {len(files)} sprites into {output_path} ({len(unique)} unique)")
+	print(f"Sheet size: {sheet_width}x{sheet_height} ({columns}x{rows} grid)")
+	
+	return metadata
+
+def trim_sprite(img):
+	"""Crop an RGBA sprite to its alpha bounding box: (cropped image or None if fully transparent, (x, y) offset)"""
+	bbox = img.getchannel("A").getbbox()
+	if bbox is None:
+		return None, (0, 0)
+	
+	return img.crop(bbox), bbox[:2]
+
+def pack_atlas(input_dir, output_path, sprite_width, sprite_height, max_size=None, sheet_format="png", mask=True,
+		dedupe=None):
+	"""
+	Crop each sprite to its alpha bounding box and bin-pack the trimmed rects (MaxRects).
+	Each entry in metadata "frames" gives the atlas rect plus the trim offset inside
+	the original sprite_width x sprite_height frame. Fully transparent frames get an empty rect.
+	With dedupe set, repeated frames share one packed rect (see pack_spritesheet).
+	"""
+	files = list_sprites(input_dir)
+	images = [load_sprite(input_dir, filename, sprite_width, sprite_height) for filename in files]
+	
+	return pack_atlas_images(files, images, output_path, sprite_width, sprite_height, max_size, sheet_format, mask, dedupe)
+
+def pack_atlas_images(files, images, output_path, sprite_width, sprite_height, max_size=None, sheet_format="png",
+		mask=True, dedupe=None):
+	"""pack_atlas for frames already in memory: `images` are sprite-sized, in `files` order"""
+	images = [img.convert("RGBA") for img in images]
+	
+	if dedupe is None:
+		unique, frame_cells = list(range(len(files))), list(range(len(files)))
+	else:
+		unique, frame_cells = dedupe_frames(images, dedupe)
+	
+	trimmed = []
+	trims = []
+	for idx in unique:
+		img, trim = trim_sprite(images[idx])
+		trimmed.append(img)
+		trims.append(trim)
+	
+	sizes = [img.size if img is not None else (0, 0) for img in trimmed]
+	sheet_width, sheet_height, positions = pack_rects(sizes, max_size)
+	
+	sheet = Image.new('RGBA', (max(sheet_width, 1), max(sheet_height, 1)), (0, 0, 0, 0))
+	for img, (x, y) in zip(trimmed, positions):
+		if img is not None:
+			sheet.paste(img, (x, y))
+	
+	frames = []
+	for filename, cell in zip(files, frame_cells):
+		(x, y), (w, h), (trim_x, trim_y) = positions[cell], sizes[cell], trims[cell]
+		frames.append({
+			"file":  filename,
+			"frame": [x, y, w, h],
+			"trim":  [trim_x, trim_y]
+		})
+	
+	metadata = {
+		"layout": "atlas",
+		"sprite_count": len(files),
+		"cell_count": len(unique),
+		"sprite_size": [sprite_width, sprite_height],
+		"sheet_size": list(sheet.size),
+		"frames": frames,
+		"files": files,
+		"frame_cells": frame_cells
 	}
+	save_sheet(sheet, output_path, metadata, sheet_format, mask)
+	
+	grid_area = sprite_width * sprite_height * len(files)
+	print(f"Packed {len(files)} trimmed sprites into {output_path} ({len(unique)} unique)")
+	print(f"Atlas size: {sheet.size[0]}x{sheet.size[1]} ({grid_area / (sheet.size[0] * sheet.size[1]):.1f}x smaller than the grid)")
+	
+	return metadata
+
+def atlas_frame(sheet, metadata, index):
+	"""Rebuild the original full-size frame `index` from an atlas sheet image"""
+	sprite_width, sprite_height = metadata["sprite_size"]
+	entry = metadata["frames"][index]
+	x, y, w, h = entry["frame"]
+	
+	frame = Image.new('RGBA', (sprite_width, sprite_height), (0, 0, 0, 0))
+	if w and h:
+		frame.paste(sheet.crop((x, y, x + w, y + h)), tuple(entry["trim"]))
+	return frame
 
 def main():
 	parser = argparse.ArgumentParser(description="Pack sprites into Playdate sprite sheet")
@@ -58,22 +255,73 @@ def main():
 	parser.add_argument("--width", type=int, default=64, help="Sprite width")
 	parser.add_argument("--height", type=int, default=64, help="Sprite height")
 	parser.add_argument("--columns", type=int, default=4, help="Columns in sheet")
+	parser.add_argument("--format", choices=SHEET_FORMATS, default="png",
+		help="png: RGBA sheet; 1bit: packed Playdate-style 1bpp planes")
+	parser.add_argument("--no-mask", action="store_true", help="1bit format: omit the mask plane")
+	parser.add_argument("--layout", choices=SHEET_LAYOUTS, default="grid",
+		help="grid: fixed cells; atlas: trimmed frames bin-packed with MaxRects")
+	parser.add_argument("--max-size", type=int, default=None, help="atlas layout: maximum atlas width/height")
+	parser.add_argument("--dedupe", action="store_true", help="Store identical frames once")
+	parser.add_argument("--dedupe-tolerance", type=int, default=None,
+		help="Also merge frames differing in at most this many pixels (implies --dedupe)")
+	parser.add_argument("--force", action="store_true", help="Repack even if inputs are unchanged")
 	
 	args = parser.parse_args()
+	mask = not args.no_mask
+	
+	dedupe = args.dedupe_tolerance
+	if dedupe is None and args.dedupe:
+		dedupe = 0
+	if dedupe is not None and dedupe < 0:
+		parser.error("--dedupe-tolerance must be zero or more")
+	
+	metadata_path = metadata_path_for(args.output)
+	sheet_dir = os.path.dirname(os.path.abspath(args.output))
+	sheet_name = os.path.basename(args.output)
+	
+	cache = BuildCache(sheet_dir, force=args.force)
+	files = list_sprites(args.input)
+	key = sheet_cache_key(args.input, files, args.width, args.height, args.columns, args.format, mask,
+		args.layout, args.max_size, dedupe)
 	
-	metadata = pack_spritesheet(
-		args.input,
-		args.output,
-		args.width,
-		args.height,
-		args.columns
-	)
+	if cache.is_fresh(sheet_name, key, [args.output, metadata_path]):
+		print(f"Skipping {sheet_name} (unchanged)")
+		return
+	
+	tracing.set_process_name("pack_spritesheet.py")
+	
+	with tracing.span("pack_spritesheet", cat="pack", sheet=sheet_name):
+		if args.layout == "atlas":
+			metadata = pack_atlas(
+				args.input,
+				args.output,
+				args.width,
+				args.height,
+				max_size=args.max_size,
+				sheet_format=args.format,
+				mask=mask,
+				dedupe=dedupe
+			)
+		else:
+			metadata = pack_spritesheet(
+				args.input,
+				args.output,
+				args.width,
+				args.height,
+				args.columns,
+				sheet_format=args.format,
+				mask=mask,
+				dedupe=dedupe
+			)
 	
 	# Save metadata
-	metadata_path = args.output.replace('.png', '_metadata.json')
 	with open(metadata_path, 'w') as f:
 		json.dump(metadata, f, indent=2)
 	
+	cache.record(sheet_name, key)
+	cache.save()
+	tracing.flush()
+	
 	print(f"Metadata saved to {metadata_path}")
 
 if __name__ == "__main__":
@@ -0,0 +1,86 @@
+"""
+Native 1-bit sheet format for the Playdate
+Each plane is packed 1bpp, MSB first, rows padded to a 32-bit stride like
+Playdate bitmaps. The image plane uses 1 = white, 0 = black; the optional
+mask plane uses 1 = opaque. The metadata JSON carries the layout.
+"""
+from PIL import Image
+import numpy as np
+
+ROW_ALIGN = 4            # bytes per row are padded to a multiple of this
+MASK_ALPHA_CUTOFF = 5    # alpha at or above this is opaque in the mask plane (dithering's visibility rule)
+WHITE_CUTOFF = 128       # gray at or above this is a white pixel
+
+def row_stride(width):
+	"""Bytes per packed row, padded to ROW_ALIGN"""
+	row_bytes = (width + 7) // 8
+	return (row_bytes + ROW_ALIGN - 1) // ROW_ALIGN * ROW_ALIGN
+
+def pack_plane(bits: np.ndarray) -> bytes:
+	"""Pack a (H, W) boolean plane into padded 1bpp rows"""
+	h, w = bits.shape
+	packed = np.packbits(bits.astype(np.uint8), axis=1, bitorder="big")
+
+	rows = np.zeros((h, row_stride(w)), dtype=np.uint8)
+	rows[:, :packed.shape[1]] = packed
+	return rows.tobytes()
+
+def unpack_plane(data: bytes, width: int, height: int, stride: int) -> np.ndarray:
+	"""Inverse of pack_plane: (H, W) boolean plane"""
+	rows = np.frombuffer(data, dtype=np.uint8, count=height * stride).reshape(height, stride)
+	return np.unpackbits(rows, axis=1, count=width, bitorder="big").astype(bool)
+
+def image_to_planes(image: Image.Image):
+	"""Split a dithered RGBA image into (white bits, opaque bits)"""
+	rgba = np.array(image.convert("RGBA"), dtype=np.uint8)
+	white = rgba[..., 0] >= WHITE_CUTOFF
+	opaque = rgba[..., 3] >= MASK_ALPHA_CUTOFF
+	return white, opaque
+
+def write_1bit_sheet(image: Image.Image, output_path, with_mask=True):
+	"""Write a sheet as packed 1bpp planes; returns the layout for the metadata JSON"""
+	width, height = image.size
+	white, opaque = image_to_planes(image)
+	stride = row_stride(width)
+	plane_size = stride * height
+
+	planes = {"image": {"offset": 0, "size": plane_size}}
+	data = pack_plane(white)
+
+	if with_mask:
+		planes["mask"] = {"offset": plane_size, "size": plane_size}
+		data += pack_plane(opaque)
+
+	with open(output_path, 'wb') as f:
+		f.write(data)
+
+	return {
+		"format":     "1bpp",
+		"width":      width,
+		"height":     height,
+		"row_stride": stride,
+		"bit_order":  "msb",
+		"white_bit":  1,
+		"planes":     planes,
+	}
+
+def read_1bit_sheet(path, layout) -> np.ndarray:
+	"""
+	Load a 1bpp sheet back as an (H, W, 4) uint8 RGBA array.
+	Without a mask plane every pixel is opaque.
+	"""
+	width, height, stride = layout["width"], layout["height"], layout["row_stride"]
+	with open(path, 'rb') as f:
+		data = f.read()
+
+	def plane(name):
+		info = layout["planes"][name]
+		return unpack_plane(data[info["offset"]:info["offset"] + info["size"]], width, height, stride)
+
+	gray = np.where(plane("image"), 255, 0).astype(np.uint8)
+	if "mask" in layout["planes"]:
+		alpha = np.where(plane("mask"), 255, 0).astype(np.uint8)
+	else:
+		alpha = np.full((height, width), 255, dtype=np.uint8)
+
+	return np.dstack([gray, gray, gray, alpha])
@@ -0,0 +1,274 @@
+"""
+In-process raw -> dither -> pack pipeline
+Frames flow through a generator from decode to dither and land straight in the
+sheet, so a finger costs one PNG decode per raw frame and one encode for the
+sheet instead of a round trip through _dithered.png files and two subprocesses.
+Writing the dithered frames is optional. Sheets and metadata come out
+byte-identical to dither.py followed by pack_spritesheet.py.
+"""
+from PIL import Image
+import numpy as np
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import tracing
+from build_cache import BuildCache, build_key
+from dither import ALGORITHMS, available_cpus, dither_cache_params, dither_image, save_png
+from pack_spritesheet import (
+	SHEET_FORMATS, SHEET_LAYOUTS, fit_sprite, metadata_path_for, pack_atlas_images, pack_grid_images
+)
+from threshold_maps import get_threshold_map
+
+#-----Frames-----#
+def dithered_name(name):
+	"""Output filename dither.py would give a raw frame"""
+	return name.replace(".png", "_dithered.png")
+
+def raw_frames(raw_dir):
+	"""(filename, path) for every PNG in a raw render directory, sorted"""
+	return [
+		(filename, os.path.join(raw_dir, filename))
+		for filename in sorted(os.listdir(raw_dir))
+		if filename.lower().endswith(".png")
+	]
+
+def load_frame(source):
+	"""Frame from a path, a PIL image, or an (H, W, 4) / (H, W) uint8 array"""
+	if isinstance(source, Image.Image):
+		return source
+	if isinstance(source, np.ndarray):
+		return Image.fromarray(source, mode="RGBA" if source.ndim == 3 else "L")
+
+	image = Image.open(source)
+	image.load()
+	return image
+
+#-----Stream-----#
+def dither_stream(frames, bayer, black_cutoff, white_cutoff, algorithm="ordered", serpentine=False,
+		dithered_dir=None):
+	"""
+	Generator: dither (name, source) frames one at a time, yielding (dithered filename, image).
+	With dithered_dir set, each frame is also written there as dither.py would, and
+	recorded in that directory's build cache when its source is a file.
+	"""
+	cache = None
+	if dithered_dir is not None:
+		os.makedirs(dithered_dir, exist_ok=True)
+		cache = BuildCache(dithered_dir)
+		params = dither_cache_params(bayer, black_cutoff, white_cutoff, algorithm, serpentine)
+
+	try:
+		for name, source in frames:
+			output_name = dithered_name(name)
+
+			with tracing.span("decode", cat="stream", file=name):
+				image = load_frame(source)
+
+			with tracing.span("dither", cat="stream", file=name):
+				dithered = dither_image(image, bayer, black_cutoff, white_cutoff, algorithm, serpentine)
+
+			if cache is not None:
+				with tracing.span("encode", cat="stream", file=name):
+					save_png(dithered, os.path.join(dithered_dir, output_name))
+				if isinstance(source, str):
+					cache.record(output_name, build_key([source], params))
+				else:
+					cache.forget(output_name)
+
+			yield output_name, dithered
+	finally:
+		if cache is not None:
+			cache.save()
+
+def pack_stream(frames, output_path, sprite_width, sprite_height, columns=4, sheet_format="png", mask=True,
+		layout="grid", max_size=None, dedupe=None):
+	"""
+	Pack (filename, image) frames from a stream into a sheet plus its metadata JSON.
+	Frames are placed in filename order, like pack_spritesheet.py. Returns the metadata.
+	"""
+	# Cells depend on the final sort order (and on every frame for dedupe/atlas),
+	# so the stream is drained before placing anything
+	named = sorted(
+		((name, fit_sprite(image, sprite_width, sprite_height)) for name, image in frames),
+		key=lambda item: item[0]
+	)
+	if not named:
+		raise ValueError(f"No frames to pack into {output_path}")
+
+	files = [name for name, _ in named]
+	images = [image for _, image in named]
+
+	os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+	with tracing.span("pack", cat="stream", sheet=os.path.basename(output_path)):
+		if layout == "atlas":
+			metadata = pack_atlas_images(files, images, output_path, sprite_width, sprite_height,
+				max_size, sheet_format, mask, dedupe)
+		else:
+			metadata = pack_grid_images(files, images, output_path, sprite_width, sprite_height,
+				columns, sheet_format, mask, dedupe)
+
+	with open(metadata_path_for(output_path), 'w') as f:
+		json.dump(metadata, f, indent=2)
+
+	return metadata
+
+#-----Fingers-----#
+def stream_cache_key(raw_paths, dither_params, sheet_params):
+	"""Build-cache key for a sheet built straight from raw frames"""
+	return build_key(raw_paths, {"dither": dither_params, "sheet": sheet_params})
+
+def process_finger(raw_dir, output_path, matrix=4, black_cutoff=10, white_cutoff=170, algorithm="ordered",
+		serpentine=False, sprite_width=300, sprite_height=200, columns=4, sheet_format="png", mask=True,
+		layout="grid", max_size=None, dedupe=None, dithered_dir=None, force=False, save_cache=True):
+	"""
+	Raw render directory -> sheet in one pass. Skipped when the raw frames and every
+	parameter match the sheet directory's build cache. Returns {"status", "seconds", "key"}.
+	With save_cache=False the caller records "key" under the sheet's name itself.
+	"""
+	with tracing.span("process_finger", cat="stream", sheet=os.path.basename(output_path)) as finger_span:
+		frames = raw_frames(raw_dir)
+		bayer = get_threshold_map(matrix)
+
+		sheet_dir = os.path.dirname(os.path.abspath(output_path))
+		sheet_name = os.path.basename(output_path)
+		metadata_path = metadata_path_for(output_path)
+		os.makedirs(sheet_dir, exist_ok=True)
+
+		cache = BuildCache(sheet_dir, force=force)
+		sheet_params = {
+			"width":    sprite_width,
+			"height":   sprite_height,
+			"columns":  columns,
+			"format":   sheet_format,
+			"mask":     mask,
+			"layout":   layout,
+			"max_size": max_size,
+			"dedupe":   dedupe,
+		}
+		dither_params = dither_cache_params(bayer, black_cutoff, white_cutoff, algorithm, serpentine)
+		key = stream_cache_key([path for _, path in frames], dither_params, sheet_params)
+
+		outputs = [output_path, metadata_path]
+		if dithered_dir is not None:
+			outputs += [os.path.join(dithered_dir, dithered_name(name)) for name, _ in frames]
+
+		if cache.is_fresh(sheet_name, key, outputs):
+			print(f"Skipping {sheet_name} (unchanged)")
+			return {"status": "skipped", "seconds": 0.0, "key": key}
+
+		stream = dither_stream(frames, bayer, black_cutoff, white_cutoff, algorithm, serpentine, dithered_dir)
+		pack_stream(stream, output_path, sprite_width, sprite_height, columns, sheet_format, mask,
+			layout, max_size, dedupe)
+
+		if save_cache:
+			cache.record(sheet_name, key)
+			cache.save()
+
+	return {"status": "success", "seconds": finger_span.seconds, "key": key}
+
+def _finger_job(job):
+	"""Pool worker: returns (name, result or None, error message or None, trace events)"""
+	name, kwargs = job
+	try:
+		return name, process_finger(**kwargs), None, tracing.drain()
+	except Exception as e:
+		return name, None, f"{type(e).__name__}: {e}", tracing.drain()
+
+def process_fingers(jobs, workers=None):
+	"""
+	Run process_finger for several fingers concurrently.
+	`jobs` maps a finger name to its process_finger keyword arguments.
+	Returns {name: result}, with failed fingers as {"status": "failed", "error"}.
+	Fingers usually share one sheet directory, so the build caches are only
+	updated and saved here, never from the workers.
+	"""
+	work = [(name, dict(kwargs, save_cache=False)) for name, kwargs in jobs.items()]
+	workers = min(workers or available_cpus(), len(work))
+
+	if workers <= 1:
+		results = map(_finger_job, work)
+	else:
+		pool = ProcessPoolExecutor(max_workers=workers)
+		results = pool.map(_finger_job, work)
+
+	summary = {}
+	caches = {}
+	try:
+		for name, result, error, events in results:
+			tracing.add_events(events)
+
+			output_path = jobs[name]["output_path"]
+			sheet_dir = os.path.dirname(os.path.abspath(output_path))
+			cache = caches.get(sheet_dir)
+			if cache is None:
+				cache = caches[sheet_dir] = BuildCache(sheet_dir)
+
+			if error is None:
+				cache.record(os.path.basename(output_path), result["key"])
+				summary[name] = result
+			else:
+				print(f"FAILED {name}: {error}", file=sys.stderr)
+				cache.forget(os.path.basename(output_path))
+				summary[name] = {"status": "failed", "error": error}
+	finally:
+		if workers > 1:
+			pool.shutdown()
+		for cache in caches.values():
+			cache.save()
+
+	return summary
+
+#-----CLI-----#
+def main():
+	parser = argparse.ArgumentParser(description="Dither raw renders and pack them into a sheet in one process")
+	parser.add_argument("--input", required=True, help="Raw render directory")
+	parser.add_argument("--output", required=True, help="Output sprite sheet path")
+	parser.add_argument("--dithered", default=None, help="Also write the dithered frames to this directory")
+	parser.add_argument("--matrix", default="4", help="Threshold map, as in dither.py")
+	parser.add_argument("--algorithm", choices=ALGORITHMS, default="ordered")
+	parser.add_argument("--serpentine", action="store_true")
+	parser.add_argument("--black-cutoff", type=int, default=10)
+	parser.add_argument("--white-cutoff", type=int, default=170)
+	parser.add_argument("--width", type=int, default=300, help="Sprite width")
+	parser.add_argument("--height", type=int, default=200, help="Sprite height")
+	parser.add_argument("--columns", type=int, default=4, help="Columns in sheet")
+	parser.add_argument("--format", choices=SHEET_FORMATS, default="png")
+	parser.add_argument("--no-mask", action="store_true", help="1bit format: omit the mask plane")
+	parser.add_argument("--layout", choices=SHEET_LAYOUTS, default="grid")
+	parser.add_argument("--max-size", type=int, default=None, help="atlas layout: maximum atlas width/height")
+	parser.add_argument("--force", action="store_true", help="Rebuild even if inputs are unchanged")
+
+	args = parser.parse_args()
+
+	try:
+		get_threshold_map(args.matrix)
+	except ValueError as e:
+		parser.error(str(e))
+
+	tracing.set_process_name("stream_pipeline.py")
+
+	process_finger(
+		args.input,
+		args.output,
+		matrix=args.matrix,
+		black_cutoff=args.black_cutoff,
+		white_cutoff=args.white_cutoff,
+		algorithm=args.algorithm,
+		serpentine=args.serpentine,
+		sprite_width=args.width,
+		sprite_height=args.height,
+		columns=args.columns,
+		sheet_format=args.format,
+		mask=not args.no_mask,
+		layout=args.layout,
+		max_size=args.max_size,
+		dithered_dir=args.dithered,
+		force=args.force
+	)
+	tracing.flush()
+
+if __name__ == "__main__":
+	main()
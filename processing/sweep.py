@@ -0,0 +1,173 @@
+"""
+Parameter sweep for tuning DITHER_CONFIG
+Every frame is decoded and converted to grayscale once. Each threshold map is
+compared against the whole (N, H, W) stack once, and every black/white cutoff
+pair is then applied as cheap boolean masks on top. Writes one labeled
+contact sheet per frame plus statistics for every combination.
+"""
+from PIL import Image, ImageDraw
+import numpy as np
+import argparse
+import json
+import os
+import time
+
+from dither import split_gray_alpha, threshold_map
+from threshold_maps import get_threshold_map
+
+LABEL_HEIGHT = 14
+CELL_GAP = 4
+BACKGROUND = 128    # transparent pixels show as gray on contact sheets
+
+#-----Sweep-----#
+def load_frames(input_dir):
+	"""(filenames, (N, H, W) gray, (N, H, W) alpha) for every PNG in input_dir"""
+	files = sorted(f for f in os.listdir(input_dir) if f.lower().endswith(".png"))
+	if not files:
+		raise ValueError(f"No PNG frames found in {input_dir}")
+
+	planes = [split_gray_alpha(Image.open(os.path.join(input_dir, f))) for f in files]
+	sizes = {p.shape for p, _ in planes}
+	if len(sizes) != 1:
+		raise ValueError(f"Sweep frames must share one size, got {sorted(sizes)}")
+
+	return files, np.stack([p for p, _ in planes]), np.stack([a for _, a in planes])
+
+def sweep(pixels, alpha, matrices, black_cutoffs, white_cutoffs):
+	"""
+	Generator over every combination: yields (matrix name, black, white, (N, H, W) bool white mask).
+	Matches dither_array() for each combination.
+	"""
+	h, w = pixels.shape[-2:]
+	visible = alpha >= 5
+
+	# The cutoff masks only depend on the cutoff, not on the matrix
+	forced_white = {white: pixels >= white for white in white_cutoffs}
+	forced_black = {black: pixels <= black for black in black_cutoffs}
+
+	for name in matrices:
+		dithered = pixels > threshold_map(get_threshold_map(name), h, w)
+		for black in black_cutoffs:
+			keep = visible & ~forced_black[black]
+			for white in white_cutoffs:
+				yield name, black, white, (dithered | forced_white[white]) & keep
+
+def sweep_stats(output, visible):
+	"""
+	White pixel ratio over visible pixels, plus two noise measures:
+	edge_noise is the share of neighbouring visible pixel pairs that differ,
+	isolated_ratio the share of visible pixels unlike all four neighbours.
+	"""
+	opaque = max(int(np.count_nonzero(visible)), 1)
+
+	h_pairs = visible[..., :, 1:] & visible[..., :, :-1]
+	v_pairs = visible[..., 1:, :] & visible[..., :-1, :]
+	h_diff = (output[..., :, 1:] != output[..., :, :-1]) & h_pairs
+	v_diff = (output[..., 1:, :] != output[..., :-1, :]) & v_pairs
+	pairs = max(int(np.count_nonzero(h_pairs) + np.count_nonzero(v_pairs)), 1)
+
+	# A pixel is isolated when it differs from every neighbour (edges of the frame excluded)
+	inner = output[..., 1:-1, 1:-1]
+	isolated = (
+		(inner != output[..., :-2, 1:-1]) & (inner != output[..., 2:, 1:-1]) &
+		(inner != output[..., 1:-1, :-2]) & (inner != output[..., 1:-1, 2:]) &
+		visible[..., 1:-1, 1:-1]
+	)
+
+	return {
+		"white_ratio":    np.count_nonzero(output & visible) / opaque,
+		"edge_noise":     (np.count_nonzero(h_diff) + np.count_nonzero(v_diff)) / pairs,
+		"isolated_ratio": np.count_nonzero(isolated) / opaque,
+	}
+
+#-----Contact Sheets-----#
+def label(matrix, black, white):
+	return f"m={matrix} b={black} w={white}"
+
+def contact_sheet(cells, alpha, columns):
+	"""
+	Lay out labeled (label, (H, W) bool) cells for one frame, `columns` per row.
+	Transparent pixels are drawn gray so black and white stay distinguishable.
+	"""
+	h, w = alpha.shape
+	rows = (len(cells) + columns - 1) // columns
+	cell_w, cell_h = w + CELL_GAP, h + LABEL_HEIGHT + CELL_GAP
+
+	canvas = np.full((rows * cell_h, columns * cell_w), BACKGROUND, dtype=np.uint8)
+	hidden = alpha < 5
+
+	for index, (_, output) in enumerate(cells):
+		x = (index % columns) * cell_w
+		y = (index // columns) * cell_h + LABEL_HEIGHT
+
+		cell = np.where(output, 255, 0).astype(np.uint8)
+		cell[hidden] = BACKGROUND
+		canvas[y:y + h, x:x + w] = cell
+
+	sheet = Image.fromarray(canvas, mode="L")
+	draw = ImageDraw.Draw(sheet)
+	for index, (text, _) in enumerate(cells):
+		draw.text(((index % columns) * cell_w + 2, (index // columns) * cell_h + 1), text, fill=255)
+
+	return sheet
+
+#-----CLI-----#
+def parse_list(value, cast=int):
+	return [cast(item) for item in value.split(",") if item.strip()]
+
+def main():
+	parser = argparse.ArgumentParser(description="Sweep dithering cutoffs and threshold maps in one batched pass")
+	parser.add_argument("--input", required=True, help="Raw render directory")
+	parser.add_argument("--output", required=True, help="Directory for contact sheets and sweep_stats.json")
+	parser.add_argument("--matrix", default="2,4,8", help="Comma-separated threshold maps (as dither.py --matrix)")
+	parser.add_argument("--black-cutoff", default="0,10,20,40", help="Comma-separated black cutoffs")
+	parser.add_argument("--white-cutoff", default="150,170,190,210", help="Comma-separated white cutoffs")
+	parser.add_argument("--no-sheets", action="store_true", help="Only compute statistics")
+
+	args = parser.parse_args()
+
+	try:
+		matrices = parse_list(args.matrix, str)
+		black_cutoffs = parse_list(args.black_cutoff)
+		white_cutoffs = parse_list(args.white_cutoff)
+		for name in matrices:
+			get_threshold_map(name)
+	except ValueError as e:
+		parser.error(str(e))
+
+	start = time.perf_counter()
+	files, pixels, alpha = load_frames(args.input)
+	visible = alpha >= 5
+	decoded = time.perf_counter()
+
+	stats = []
+	cells = [[] for _ in files]
+	for name, black, white, output in sweep(pixels, alpha, matrices, black_cutoffs, white_cutoffs):
+		stats.append(dict(matrix=name, black_cutoff=black, white_cutoff=white, **sweep_stats(output, visible)))
+		if not args.no_sheets:
+			for index in range(len(files)):
+				cells[index].append((label(name, black, white), output[index]))
+	swept = time.perf_counter()
+
+	os.makedirs(args.output, exist_ok=True)
+	if not args.no_sheets:
+		for filename, frame_cells, frame_alpha in zip(files, cells, alpha):
+			sheet = contact_sheet(frame_cells, frame_alpha, len(white_cutoffs))
+			# Contact sheets are for eyeballing; fast compression keeps the sweep quick
+			sheet.save(os.path.join(args.output, filename.replace(".png", "_sweep.png")), compress_level=1)
+
+	stats_path = os.path.join(args.output, "sweep_stats.json")
+	with open(stats_path, 'w') as f:
+		json.dump(stats, f, indent=2)
+
+	print(f"{'matrix':<14} {'black':>6} {'white':>6} {'white %':>8} {'edge noise':>11} {'isolated %':>11}")
+	for entry in stats:
+		print(f"{entry['matrix']:<14} {entry['black_cutoff']:>6} {entry['white_cutoff']:>6} "
+			f"{entry['white_ratio'] * 100:>7.1f}% {entry['edge_noise']:>11.3f} {entry['isolated_ratio'] * 100:>10.2f}%")
+
+	print(f"\n{len(stats)} combinations x {len(files)} frames: decode {decoded - start:.2f}s, "
+		f"sweep {swept - decoded:.2f}s, write {time.perf_counter() - swept:.2f}s")
+	print(f"Statistics saved to {stats_path}")
+
+if __name__ == "__main__":
+	main()
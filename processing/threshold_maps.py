@@ -0,0 +1,168 @@
+"""
+Threshold maps for ordered dithering
+Every map is a (size, size) integer rank matrix with the values 0..size*size-1,
+like the classic Bayer matrices, so it plugs straight into dither.threshold_map().
+
+  bayer2, bayer4, bayer8, bayer16, ...   recursive Bayer, any power of two
+  bluenoise64, bluenoise64:7             void-and-cluster blue noise (size, seed)
+
+Blue noise is slow to generate, so maps are memoized in-process and persisted
+as .npy files in THRESHOLD_CACHE_DIR (override with $SPRITE_THRESHOLD_CACHE).
+"""
+import numpy as np
+import os
+import re
+
+THRESHOLD_CACHE_DIR = os.environ.get(
+	"SPRITE_THRESHOLD_CACHE",
+	os.path.join(os.path.expanduser("~"), ".cache", "sprite_ditherer", "threshold_maps")
+)
+
+BLUE_NOISE_SIGMA = 1.5      # Gaussian filter width used to measure clusters and voids
+BLUE_NOISE_SEED = 0
+BLUE_NOISE_INITIAL = 0.1    # fraction of pixels in the initial binary pattern
+
+_memo = {}
+
+#-----Bayer-----#
+def bayer_matrix(size: int) -> np.ndarray:
+	"""Recursive Bayer rank matrix for a power-of-two size"""
+	if size < 1 or size & (size - 1):
+		raise ValueError(f"Bayer size must be a power of two, got {size}")
+
+	matrix = np.zeros((1, 1), dtype=np.int64)
+	while matrix.shape[0] < size:
+		matrix = np.block([
+			[4 * matrix,     4 * matrix + 2],
+			[4 * matrix + 3, 4 * matrix + 1],
+		])
+	return matrix
+
+#-----Blue Noise-----#
+def _gaussian_kernel(size, sigma):
+	"""Toroidal Gaussian centred on (0, 0), so rolling it places it anywhere"""
+	d = np.minimum(np.arange(size), size - np.arange(size)).astype(np.float64)
+	return np.exp(-(d[:, None] ** 2 + d[None, :] ** 2) / (2 * sigma ** 2))
+
+def void_and_cluster(size: int, seed: int = BLUE_NOISE_SEED, sigma: float = BLUE_NOISE_SIGMA) -> np.ndarray:
+	"""
+	Ulichney's void-and-cluster blue-noise rank matrix.
+	Energy is kept incrementally (one rolled kernel per pixel change) instead of
+	re-filtering the whole pattern for every rank.
+	"""
+	rng = np.random.default_rng(seed)
+	total = size * size
+	kernel = _gaussian_kernel(size, sigma)
+
+	def splat(energy, y, x, sign):
+		energy += sign * np.roll(kernel, (y, x), axis=(0, 1))
+
+	def tightest_cluster(pattern, energy):
+		return np.unravel_index(np.argmax(np.where(pattern, energy, -np.inf)), pattern.shape)
+
+	def largest_void(pattern, energy):
+		return np.unravel_index(np.argmin(np.where(pattern, np.inf, energy)), pattern.shape)
+
+	# Initial binary pattern: a random sprinkle of minority pixels
+	pattern = np.zeros((size, size), dtype=bool)
+	seeds = rng.choice(total, size=max(1, int(total * BLUE_NOISE_INITIAL)), replace=False)
+	pattern.flat[seeds] = True
+
+	energy = np.zeros((size, size), dtype=np.float64)
+	for y, x in zip(*np.nonzero(pattern)):
+		splat(energy, y, x, 1)
+
+	# Relax: move the tightest cluster pixel into the largest void until stable
+	for _ in range(total):
+		cy, cx = tightest_cluster(pattern, energy)
+		pattern[cy, cx] = False
+		splat(energy, cy, cx, -1)
+
+		vy, vx = largest_void(pattern, energy)
+		pattern[vy, vx] = True
+		splat(energy, vy, vx, 1)
+
+		if (vy, vx) == (cy, cx):
+			break
+
+	ranks = np.zeros((size, size), dtype=np.int64)
+	initial, initial_energy = pattern.copy(), energy.copy()
+	ones = int(pattern.sum())
+
+	# Phase 1: rank the initial pattern by peeling off its tightest clusters
+	for rank in range(ones - 1, -1, -1):
+		y, x = tightest_cluster(pattern, energy)
+		pattern[y, x] = False
+		splat(energy, y, x, -1)
+		ranks[y, x] = rank
+
+	# Phases 2 and 3: fill the largest voids until every pixel has a rank
+	# (the tightest cluster of zeros is exactly the largest void of the ones)
+	pattern, energy = initial, initial_energy
+	for rank in range(ones, total):
+		y, x = largest_void(pattern, energy)
+		pattern[y, x] = True
+		splat(energy, y, x, 1)
+		ranks[y, x] = rank
+
+	return ranks
+
+def blue_noise(size: int, seed: int = BLUE_NOISE_SEED) -> np.ndarray:
+	"""Blue-noise rank matrix, loaded from the on-disk cache when available"""
+	path = os.path.join(THRESHOLD_CACHE_DIR, f"bluenoise_{size}_{seed}.npy")
+	if os.path.exists(path):
+		try:
+			ranks = np.load(path)
+			if ranks.shape == (size, size):
+				return ranks
+		except (OSError, ValueError):
+			pass
+
+	ranks = void_and_cluster(size, seed)
+
+	try:
+		os.makedirs(THRESHOLD_CACHE_DIR, exist_ok=True)
+		tmp_path = f"{path}.{os.getpid()}.tmp"
+		with open(tmp_path, 'wb') as f:
+			np.save(f, ranks)
+		os.replace(tmp_path, path)
+	except OSError as e:
+		print(f"Warning: could not cache blue noise map at {path}: {e}")
+
+	return ranks
+
+#-----Provider-----#
+_NAME_PATTERN = re.compile(r"^(bayer|bluenoise)(\d+)(?::(\d+))?$")
+
+def get_threshold_map(name) -> np.ndarray:
+	"""
+	Rank matrix by name ("bayer8", "bluenoise64", "bluenoise64:3").
+	A bare size (4 or "4") means a Bayer matrix, as DITHER_CONFIG["matrix"] always has.
+	"""
+	key = str(name).strip().lower()
+	if key.isdigit():
+		key = f"bayer{key}"
+
+	cached = _memo.get(key)
+	if cached is not None:
+		return cached
+
+	match = _NAME_PATTERN.match(key)
+	if match is None:
+		raise ValueError(f"Unknown threshold map '{name}'. Use bayerN or bluenoiseN[:seed]")
+
+	kind, size, seed = match.group(1), int(match.group(2)), match.group(3)
+	if kind == "bayer":
+		if seed is not None:
+			raise ValueError(f"Bayer maps take no seed: '{name}'")
+		ranks = bayer_matrix(size)
+	else:
+		ranks = blue_noise(size, int(seed) if seed is not None else BLUE_NOISE_SEED)
+
+	ranks.flags.writeable = False
+	_memo[key] = ranks
+	return ranks
+
+def normalized(ranks: np.ndarray) -> np.ndarray:
+	"""Rank matrix as float thresholds in (0, 1): (rank + 0.5) / count"""
+	return (ranks.astype(np.float64) + 0.5) / ranks.size
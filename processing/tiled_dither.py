@@ -0,0 +1,207 @@
+"""
+Tiled dithering for very large renders
+The frame is processed in horizontal bands: ordered dithering only depends on
+pixel position, so each band is dithered with the threshold map shifted to its
+row offset, and error diffusion already runs one scanline at a time. Bands
+are streamed straight into a PNG encoder (or a memory-mapped .npy), so the
+working set is a few bands instead of several full-size float arrays.
+Output pixels are identical to dithering the whole image at once.
+
+A .npy source (H, W, 4 uint8) is memory-mapped and read band by band too.
+A PNG source has to be decoded once, but is only cropped and converted to
+arrays one band at a time.
+"""
+from PIL import Image
+import numpy as np
+import argparse
+import collections
+import os
+import struct
+import zlib
+
+from dither import ALGORITHMS, dither_array
+from error_diffusion import diffuse_rows, get_kernel
+from threshold_maps import get_threshold_map
+
+DEFAULT_BAND_HEIGHT = 256
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+IDAT_CHUNK = 1 << 20    # flush compressed data in chunks of about this size
+
+#-----Sources-----#
+def open_source(path):
+	"""
+	A memory-mapped (H, W, 4) uint8 array for .npy, otherwise the decoded PIL image.
+	Images are only converted band by band (source_band), never as a whole frame.
+	"""
+	if path.lower().endswith(".npy"):
+		rgba = np.load(path, mmap_mode="r")
+		if rgba.ndim != 3 or rgba.shape[2] != 4 or rgba.dtype != np.uint8:
+			raise ValueError(f"{path}: expected an (H, W, 4) uint8 array, got {rgba.shape} {rgba.dtype}")
+		return rgba
+
+	image = Image.open(path)
+	image.load()
+	return image
+
+def source_size(source):
+	"""(height, width) of an open_source() result"""
+	if isinstance(source, Image.Image):
+		return source.height, source.width
+	return source.shape[:2]
+
+def source_band(source, y, band_height):
+	"""Rows y .. y + band_height of a source as a (h, W, 4) uint8 RGBA array"""
+	if isinstance(source, Image.Image):
+		band = source.crop((0, y, source.width, min(y + band_height, source.height)))
+		if band.mode != "RGBA":
+			band = band.convert("RGBA")
+		return np.asarray(band)
+	return np.ascontiguousarray(source[y:y + band_height])
+
+def gray_bands(source, band_height):
+	"""Generator: (row offset, gray band, alpha band), converted exactly like split_gray_alpha()"""
+	height = source_size(source)[0]
+	for y in range(0, height, band_height):
+		band = source_band(source, y, band_height)
+		gray = Image.fromarray(np.ascontiguousarray(band[..., :3]), mode="RGB").convert("L")
+		yield y, np.asarray(gray, dtype=np.uint8), band[..., 3]
+
+#-----Dithering-----#
+def dither_bands(source, bayer, black_cutoff, white_cutoff, algorithm="ordered", serpentine=False,
+		band_height=DEFAULT_BAND_HEIGHT):
+	"""Generator: (row offset, (h, W, 4) uint8 RGBA band) of the dithered frame, top to bottom"""
+	if algorithm == "ordered":
+		for y, gray, alpha in gray_bands(source, band_height):
+			output = dither_array(gray, alpha, bayer, black_cutoff, white_cutoff, row_offset=y)
+			yield y, np.dstack([output, output, output, alpha])
+		return
+
+	# Error diffusion carries state between rows, so feed one continuous row stream
+	# through a single diffuse_rows() and regroup its output into bands
+	kernel = get_kernel(algorithm)
+	width = source_size(source)[1]
+	alpha_rows = collections.deque()
+
+	def rows():
+		for _, gray, alpha in gray_bands(source, band_height):
+			for gray_row, alpha_row in zip(gray, alpha):
+				alpha_rows.append(alpha_row)
+				yield gray_row, alpha_row
+
+	band = []
+	y = 0
+	for output_row in diffuse_rows(rows(), width, kernel, black_cutoff, white_cutoff, serpentine):
+		alpha_row = alpha_rows.popleft()
+		band.append(np.stack([output_row, output_row, output_row, alpha_row], axis=-1))
+		if len(band) == band_height:
+			yield y, np.stack(band)
+			y += len(band)
+			band = []
+	if band:
+		yield y, np.stack(band)
+
+#-----Writers-----#
+class PngStreamWriter:
+	"""
+	Write an 8-bit RGBA PNG band by band: rows are deflated as they arrive
+	(filter type 0), so the encoder never holds the whole image.
+	"""
+
+	def __init__(self, path, width, height):
+		self.width = width
+		self.height = height
+		self.rows = 0
+		self.file = open(path, 'wb')
+		self.compressor = zlib.compressobj(6)
+		self.pending = bytearray()
+
+		self.file.write(PNG_SIGNATURE)
+		self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+
+	def _chunk(self, kind, data):
+		self.file.write(struct.pack(">I", len(data)))
+		self.file.write(kind)
+		self.file.write(data)
+		self.file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind)) & 0xFFFFFFFF))
+
+	def write(self, band):
+		"""Append (h, W, 4) uint8 rows"""
+		h, w = band.shape[:2]
+		if w != self.width or self.rows + h > self.height:
+			raise ValueError(f"Band of {w}x{h} does not fit a {self.width}x{self.height} image at row {self.rows}")
+
+		filtered = np.zeros((h, 1 + w * 4), dtype=np.uint8)
+		filtered[:, 1:] = band.reshape(h, w * 4)
+		self.pending += self.compressor.compress(filtered.tobytes())
+		self.rows += h
+
+		if len(self.pending) >= IDAT_CHUNK:
+			self._chunk(b"IDAT", bytes(self.pending))
+			self.pending.clear()
+
+	def close(self):
+		if self.rows != self.height:
+			raise ValueError(f"Wrote {self.rows} of {self.height} rows")
+		self.pending += self.compressor.flush()
+		self._chunk(b"IDAT", bytes(self.pending))
+		self._chunk(b"IEND", b"")
+		self.file.close()
+
+def dither_large_file(input_path, output_path, bayer, black_cutoff, white_cutoff, algorithm="ordered",
+		serpentine=False, band_height=DEFAULT_BAND_HEIGHT):
+	"""
+	Dither one large image band by band into a PNG, or into a memory-mapped
+	(H, W, 4) uint8 .npy when output_path ends in .npy. Written through a temp file.
+	"""
+	source = open_source(input_path)
+	height, width = source_size(source)
+	bands = dither_bands(source, bayer, black_cutoff, white_cutoff, algorithm, serpentine, band_height)
+
+	tmp_path = output_path + ".tmp"
+	try:
+		if output_path.lower().endswith(".npy"):
+			output = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.uint8, shape=(height, width, 4))
+			for y, band in bands:
+				output[y:y + len(band)] = band
+			output.flush()
+			del output
+		else:
+			writer = PngStreamWriter(tmp_path, width, height)
+			try:
+				for _, band in bands:
+					writer.write(band)
+				writer.close()
+			finally:
+				writer.file.close()
+		os.replace(tmp_path, output_path)
+	finally:
+		if os.path.exists(tmp_path):
+			os.remove(tmp_path)
+
+#-----CLI-----#
+def main():
+	parser = argparse.ArgumentParser(description="Dither one very large render in horizontal bands")
+	parser.add_argument("--input", required=True, help="Input image (PNG, or an (H, W, 4) uint8 .npy)")
+	parser.add_argument("--output", required=True, help="Output PNG, or .npy for a memory-mapped array")
+	parser.add_argument("--matrix", default="4", help="Threshold map, as in dither.py")
+	parser.add_argument("--algorithm", choices=ALGORITHMS, default="ordered")
+	parser.add_argument("--serpentine", action="store_true")
+	parser.add_argument("--black-cutoff", type=int, default=10)
+	parser.add_argument("--white-cutoff", type=int, default=170)
+	parser.add_argument("--band-height", type=int, default=DEFAULT_BAND_HEIGHT, help="Rows per band")
+
+	args = parser.parse_args()
+	if args.band_height < 1:
+		parser.error("--band-height must be at least 1")
+
+	try:
+		bayer = get_threshold_map(args.matrix)
+	except ValueError as e:
+		parser.error(str(e))
+
+	dither_large_file(args.input, args.output, bayer, args.black_cutoff, args.white_cutoff,
+		args.algorithm, args.serpentine, args.band_height)
+	print(f"Dithered {args.input} -> {args.output}")
+
+if __name__ == "__main__":
+	main()
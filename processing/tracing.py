@@ -0,0 +1,135 @@
+"""
+Lightweight timing spans exported as Chrome trace-event JSON
+Tracing is switched on by the SPRITE_TRACE_DIR environment variable, which
+subprocesses inherit. Every process buffers its own events and flushes them
+to a fragment file in that directory; merge_traces() stitches the fragments
+into one timeline (timestamps are wall-clock microseconds, shared by all
+processes on the machine). Standard library only, so Blender can import it.
+"""
+import json
+import os
+import threading
+import time
+
+TRACE_ENV = "SPRITE_TRACE_DIR"
+
+_trace_dir = os.environ.get(TRACE_ENV) or None
+_events = []
+_lock = threading.Lock()
+_process_name = None
+
+def enabled():
+	return _trace_dir is not None
+
+def enable(trace_dir):
+	"""Turn tracing on for this process and every subprocess started afterwards"""
+	global _trace_dir
+	os.makedirs(trace_dir, exist_ok=True)
+	os.environ[TRACE_ENV] = trace_dir
+	_trace_dir = trace_dir
+
+def set_process_name(name):
+	"""Label this process's row in the trace viewer"""
+	global _process_name
+	_process_name = name
+
+def _now_us():
+	return time.time_ns() // 1000
+
+class span:
+	"""
+	Time a block. Always measures `seconds`; only records a trace event when
+	tracing is enabled, so it is cheap to leave in hot paths.
+	"""
+
+	__slots__ = ("name", "cat", "args", "seconds", "_start", "_ts")
+
+	def __init__(self, name, cat="pipeline", **args):
+		self.name = name
+		self.cat = cat
+		self.args = args
+		self.seconds = 0.0
+
+	def __enter__(self):
+		if _trace_dir is not None:
+			self._ts = _now_us()
+		self._start = time.perf_counter()
+		return self
+
+	def __exit__(self, *exc):
+		self.seconds = time.perf_counter() - self._start
+		if _trace_dir is not None:
+			event = {
+				"name": self.name,
+				"cat":  self.cat,
+				"ph":   "X",
+				"ts":   self._ts,
+				"dur":  int(self.seconds * 1e6),
+				"pid":  os.getpid(),
+				"tid":  threading.get_ident() % (1 << 31),
+			}
+			if self.args:
+				event["args"] = self.args
+			with _lock:
+				_events.append(event)
+		return False
+
+def drain():
+	"""Take and clear this process's buffered events (e.g. to ship them from a pool worker)"""
+	with _lock:
+		events = list(_events)
+		_events.clear()
+	return events
+
+def add_events(events):
+	"""Adopt events recorded by another process"""
+	if _trace_dir is not None and events:
+		with _lock:
+			_events.extend(events)
+
+def flush():
+	"""Write buffered events to a fragment file in the trace directory"""
+	if _trace_dir is None:
+		return None
+
+	events = drain()
+	pid = os.getpid()
+	if _process_name:
+		events.insert(0, {
+			"name": "process_name",
+			"ph":   "M",
+			"pid":  pid,
+			"args": {"name": _process_name},
+		})
+	if not events:
+		return None
+
+	os.makedirs(_trace_dir, exist_ok=True)
+	path = os.path.join(_trace_dir, f"trace-{pid}-{_now_us()}.json")
+	with open(path, 'w') as f:
+		json.dump(events, f)
+	return path
+
+def merge_traces(trace_dir, output_path):
+	"""Combine every fragment in trace_dir into one Chrome trace file; returns the events"""
+	events = []
+	for filename in sorted(os.listdir(trace_dir)):
+		if filename.startswith("trace-") and filename.endswith(".json"):
+			with open(os.path.join(trace_dir, filename), 'r') as f:
+				events.extend(json.load(f))
+
+	events.sort(key=lambda e: (e.get("ph") != "M", e.get("ts", 0)))
+	with open(output_path, 'w') as f:
+		json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+	return events
+
+def summarize(events):
+	"""Total seconds and count per span name"""
+	totals = {}
+	for event in events:
+		if event.get("ph") != "X":
+			continue
+		entry = totals.setdefault(event["name"], {"count": 0, "seconds": 0.0})
+		entry["count"] += 1
+		entry["seconds"] += event["dur"] / 1e6
+	return totals
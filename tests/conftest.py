@@ -0,0 +1,10 @@
+"""
+The scripts import their siblings by module name (see the sys.path setup in
+blender/run_pipeline.py), so the tests put both script directories on the path too.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "processing"))
+sys.path.insert(0, os.path.join(ROOT, "blender"))
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Stand-in for `blender --background file.blend --python export_all_fingers.py -- ...`.
+Writes a success summary for the requested fingers without rendering anything.
+FAKE_BLENDER_FAIL=<finger> makes the shard holding that finger crash before
+writing its summary; FAKE_BLENDER_LOG=<path> appends each shard's finger list.
+"""
+import json
+import os
+import sys
+
+args = sys.argv[sys.argv.index("--") + 1:]
+fingers = args[args.index("--fingers") + 1].split(",")
+summary_path = args[args.index("--summary") + 1]
+
+log_path = os.environ.get("FAKE_BLENDER_LOG")
+if log_path:
+	with open(log_path, 'a') as f:
+		f.write(",".join(fingers) + "\n")
+
+if os.environ.get("FAKE_BLENDER_FAIL") in fingers:
+	print("Error: fake render crashed", file=sys.stderr)
+	sys.exit(3)
+
+with open(summary_path, 'w') as f:
+	json.dump({name: {"status": "success", "flags": args} for name in fingers}, f)
@@ -0,0 +1,73 @@
+"""sample_poses() with a synthetic render/difference pair, no Blender involved"""
+import pytest
+
+from adaptive_sampling import sample_poses
+
+def step_render(angle):
+	"""A 'frame' is just its angle; differences are measured on angle distance"""
+	return angle
+
+def make_difference(edge=None):
+	"""Angle distance, with a big jump across `edge` so sampling concentrates there"""
+	def difference(a, b):
+		diff = abs(a - b) * 0.1
+		if edge is not None and min(a, b) < edge <= max(a, b):
+			diff += 1.0
+		return diff
+	return difference
+
+def angles(samples):
+	return [angle for angle, _ in samples]
+
+def test_budget_caps_renders():
+	rendered = []
+
+	def render(angle):
+		rendered.append(angle)
+		return angle
+
+	samples = sample_poses(0.0, 1.0, render, make_difference(edge=0.4), budget=9, threshold=0.0, coarse=3)
+
+	assert len(samples) == 9
+	assert len(rendered) == 9
+	assert angles(samples) == sorted(angles(samples))
+	assert angles(samples)[0] == 0.0 and angles(samples)[-1] == 1.0
+
+def test_threshold_stops_early():
+	# Every coarse interval differs by 0.1 * 0.25 = 0.025, below the threshold
+	samples = sample_poses(0.0, 1.0, step_render, make_difference(), budget=16, threshold=0.05, coarse=5)
+
+	assert angles(samples) == [0.0, 0.25, 0.5, 0.75, 1.0]
+
+def test_splits_where_frames_change_most():
+	samples = sample_poses(0.0, 1.0, step_render, make_difference(edge=0.4), budget=8, threshold=0.5, coarse=3)
+	added = [a for a in angles(samples) if a not in (0.0, 0.5, 1.0)]
+
+	# Only the interval holding the jump is refined
+	assert added
+	assert all(0.0 < a < 0.5 for a in added)
+
+def test_start_greater_than_end_keeps_animation_order():
+	samples = sample_poses(0.0, -1.3, step_render, make_difference(edge=-0.6), budget=7, threshold=0.0, coarse=3)
+	result = angles(samples)
+
+	assert result[0] == 0.0 and result[-1] == -1.3
+	assert result == sorted(result, reverse=True)
+
+def test_unsplittable_interval_ends_the_search():
+	# Only the interval touching 0 ever differs, so it is halved until no float fits
+	# between its ends; the search must then stop well short of the budget
+	samples = sample_poses(0.0, 1.0, step_render, lambda a, b: 1.0 if min(a, b) == 0.0 else 0.0,
+		budget=5000, threshold=0.5, coarse=3)
+	result = angles(samples)
+
+	assert len(result) < 5000
+	assert len(set(result)) == len(result)
+	assert result[1] == 5e-324    # smallest positive float: the interval could not be split further
+
+def test_single_frame_budget():
+	assert sample_poses(0.0, 1.0, step_render, make_difference(), budget=1) == [(0.0, 0.0)]
+
+def test_rejects_empty_budget():
+	with pytest.raises(ValueError):
+		sample_poses(0.0, 1.0, step_render, make_difference(), budget=0)
@@ -0,0 +1,75 @@
+"""Vectorized ordered dithering against the original per-pixel loop"""
+from PIL import Image
+import numpy as np
+
+import pytest
+
+from dither import BAYER_2x2, BAYER_4x4, ordered_dither, ordered_dither_batch
+
+def reference_dither(image, bayer, black_cutoff, white_cutoff):
+	"""The original pixel-by-pixel ordered_dither(), kept verbatim as the reference"""
+	image = image.convert("RGBA")
+	r, g, b, a = image.split()
+
+	gray = Image.merge("RGB", (r, g, b)).convert("L")
+	pixels = np.array(gray, dtype=np.float32)
+	alpha = np.array(a, dtype=np.uint8)
+
+	h, w = pixels.shape
+	t_h, t_w = bayer.shape
+	matrix_size = t_h * t_w
+
+	output = np.zeros((h, w), dtype=np.uint8)
+
+	for y in range(h):
+		for x in range(w):
+			if alpha[y, x] < 5:
+				continue
+
+			pixel = pixels[y, x]
+
+			if pixel <= black_cutoff:
+				continue
+
+			if pixel >= white_cutoff:
+				output[y, x] = 255
+				continue
+
+			threshold = bayer[y % t_h, x % t_w]
+			threshold_value = (threshold + 0.5) / matrix_size * 255
+
+			output[y, x] = 255 if pixel > threshold_value else 0
+
+	result = Image.fromarray(output, mode="L")
+	return Image.merge("RGBA", (result, result, result, Image.fromarray(alpha)))
+
+def random_frame(seed, size=(37, 23)):
+	"""RGBA noise with odd dimensions (partial matrix tiles) and alpha around the visibility cutoff"""
+	rng = np.random.default_rng(seed)
+	w, h = size
+	rgba = rng.integers(0, 256, size=(h, w, 4), dtype=np.uint8)
+	rgba[..., 3] = rng.choice([0, 4, 5, 6, 128, 255], size=(h, w))
+	return Image.fromarray(rgba, mode="RGBA")
+
+# (black, white); the last pair is inverted, where the black cutoff wins
+CUTOFFS = [(10, 170), (0, 255), (60, 90), (128, 128), (200, 50)]
+
+@pytest.mark.parametrize("bayer", [BAYER_2x2, BAYER_4x4], ids=["2x2", "4x4"])
+@pytest.mark.parametrize("black, white", CUTOFFS)
+def test_matches_reference_loop(bayer, black, white):
+	for seed in range(3):
+		frame = random_frame(seed)
+		expected = np.asarray(reference_dither(frame, bayer, black, white))
+		assert np.array_equal(np.asarray(ordered_dither(frame, bayer, black, white)), expected)
+
+@pytest.mark.parametrize("bayer", [BAYER_2x2, BAYER_4x4], ids=["2x2", "4x4"])
+def test_batch_matches_reference_loop(bayer):
+	frames = [random_frame(seed) for seed in range(4)]
+	for black, white in CUTOFFS:
+		batch = ordered_dither_batch(frames, bayer, black, white)
+		for frame, result in zip(frames, batch):
+			assert np.array_equal(np.asarray(result), np.asarray(reference_dither(frame, bayer, black, white)))
+
+def test_batch_rejects_mixed_sizes():
+	with pytest.raises(ValueError):
+		ordered_dither_batch([random_frame(0), random_frame(1, size=(10, 10))], BAYER_4x4, 10, 170)
@@ -0,0 +1,114 @@
+"""Dither worker protocol: serve() in-process, and DitherWorker against a real worker process"""
+from PIL import Image
+import numpy as np
+import io
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+from dither_worker import DitherWorker, serve
+
+def write_frame(path, seed):
+	rng = np.random.default_rng(seed)
+	rgba = rng.integers(0, 256, size=(20, 30, 4), dtype=np.uint8)
+	Image.fromarray(rgba, mode="RGBA").save(path)
+	return str(path)
+
+def dither_request(ticket, input_path, output_path, **extra):
+	return dict(op="dither", id=ticket, input=input_path, output=output_path, matrix=4,
+		black_cutoff=10, white_cutoff=170, **extra)
+
+def run_serve(monkeypatch, requests):
+	"""Feed protocol lines to serve() and return the decoded replies"""
+	# serve() points sys.stdout at stderr; monkeypatch puts it back afterwards
+	monkeypatch.setattr(sys, "stdout", sys.stdout)
+	lines = [r if isinstance(r, str) else json.dumps(r) for r in requests]
+	stdout = io.StringIO()
+	serve(io.StringIO("\n".join(lines) + "\n"), stdout)
+	return [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+def test_serve_ops(tmp_path, monkeypatch):
+	a = write_frame(tmp_path / "a.png", 0)
+	b = write_frame(tmp_path / "b.png", 1)
+	out_a = str(tmp_path / "out" / "a_dithered.png")
+	out_b = str(tmp_path / "out" / "b_dithered.png")
+
+	replies = run_serve(monkeypatch, [
+		{"op": "ping", "id": 0},
+		dither_request(1, a, out_a),
+		dither_request(2, b, out_b),
+		dither_request(3, a, out_a),
+		{"op": "diff", "id": 4, "a": out_a, "b": out_a},
+		{"op": "diff", "id": 5, "a": out_a, "b": out_b},
+		{"op": "remove", "id": 6, "paths": [out_b, str(tmp_path / "out" / "missing_dithered.png")]},
+		"{not json",
+		{"op": "explode", "id": 7},
+		dither_request(8, str(tmp_path / "missing.png"), out_a, force=True),
+	])
+
+	assert [r["id"] for r in replies] == [0, 1, 2, 3, 4, 5, 6, None, 7, 8]
+	assert replies[0]["ok"]
+	assert replies[1]["ok"] and not replies[1]["skipped"]
+	assert set(replies[1]["timing"]) == {"decode", "dither", "encode"}
+	assert replies[3]["ok"] and replies[3]["skipped"]
+	assert replies[4]["difference"] == 0.0
+	assert 0.0 < replies[5]["difference"] <= 1.0
+	assert replies[6] == {"id": 6, "ok": True, "removed": 1}
+	assert not replies[7]["ok"] and replies[7]["error"].startswith("Bad request")
+	assert not replies[8]["ok"] and "Unknown op" in replies[8]["error"]
+	assert not replies[9]["ok"]
+
+	assert os.path.exists(out_a) and not os.path.exists(out_b)
+	with open(tmp_path / "out" / ".build_cache.json") as f:
+		assert list(json.load(f)) == ["a_dithered.png"]
+
+def test_serve_stops_at_shutdown(monkeypatch):
+	replies = run_serve(monkeypatch, [
+		{"op": "ping", "id": 0},
+		{"op": "shutdown"},
+		{"op": "ping", "id": 1},
+	])
+
+	assert [r["id"] for r in replies] == [0]
+
+def test_client_round_trip(tmp_path):
+	frames = [write_frame(tmp_path / f"f_{i}.png", i) for i in range(8)]
+	outputs = [str(tmp_path / "out" / f"f_{i}_dithered.png") for i in range(8)]
+
+	with DitherWorker(sys.executable) as worker:
+		assert worker.ping()["ok"]
+
+		# Submits from several threads must not interleave protocol lines
+		tickets = {}
+
+		def submit(i):
+			tickets[i] = worker.submit(frames[i], outputs[i], 4, 10, 170)
+
+		threads = [threading.Thread(target=submit, args=(i,)) for i in range(8)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		assert sorted(tickets.values()) == list(range(1, 9))
+		assert all(worker.wait(ticket)["ok"] for ticket in tickets.values())
+		assert worker.difference(outputs[0], outputs[0]) == 0.0
+		assert worker.remove([outputs[7]]) == 1
+
+	assert worker.proc.returncode == 0
+	assert all(os.path.exists(path) for path in outputs[:7])
+	assert not os.path.exists(outputs[7])
+
+def test_client_worker_exit_before_reply(tmp_path):
+	worker = DitherWorker(sys.executable)
+	try:
+		worker.proc.kill()
+		worker.proc.wait()
+
+		with pytest.raises(RuntimeError):
+			worker.wait(worker.submit(write_frame(tmp_path / "a.png", 0), str(tmp_path / "a_dithered.png"), 4, 10, 170))
+	finally:
+		worker.close()
@@ -0,0 +1,87 @@
+"""1bpp sheets against the PNG sheets they replace"""
+from PIL import Image
+import numpy as np
+import json
+import os
+import sys
+
+import pytest
+
+from dither import BAYER_4x4, ordered_dither
+from pack_spritesheet import main as pack_main, metadata_path_for, pack_atlas, pack_spritesheet
+from playdate_bitmap import read_1bit_sheet
+
+def soft_frame(seed, size=(40, 30)):
+	"""A shaded blob whose alpha fades out over its edge, like a film_transparent render"""
+	rng = np.random.default_rng(seed)
+	w, h = size
+	y, x = np.mgrid[0:h, 0:w]
+	cx, cy = rng.uniform(0.3, 0.7) * w, rng.uniform(0.3, 0.7) * h
+	distance = np.hypot((x - cx) / (w * 0.35), (y - cy) / (h * 0.35))
+
+	rgba = np.zeros((h, w, 4), dtype=np.uint8)
+	rgba[..., :3] = np.clip(255 * (1.2 - distance), 0, 255)[..., None]
+	rgba[..., 3] = np.clip(255 * (1.5 - distance) * 2, 0, 255)
+	return Image.fromarray(rgba, mode="RGBA")
+
+@pytest.fixture
+def dithered_dir(tmp_path):
+	frames_dir = tmp_path / "dithered"
+	frames_dir.mkdir()
+	for i in range(6):
+		ordered_dither(soft_frame(i), BAYER_4x4, 10, 170).save(frames_dir / f"index_{i:02d}_dithered.png")
+	return str(frames_dir)
+
+def assert_same_pixels(png_path, bin_path, layout, with_mask=True):
+	png = np.asarray(Image.open(png_path).convert("RGBA"))
+	packed = read_1bit_sheet(bin_path, layout)
+	visible = png[..., 3] >= 5
+
+	# The frames really have partial alpha, or the test proves nothing
+	assert np.any(visible & (png[..., 3] < 255))
+
+	assert np.array_equal(packed[..., 0] == 255, png[..., 0] == 255)
+	if with_mask:
+		assert np.array_equal(packed[..., 3] == 255, visible)
+	else:
+		assert np.all(packed[..., 3] == 255)
+
+@pytest.mark.parametrize("with_mask", [True, False], ids=["mask", "no-mask"])
+def test_grid_sheet_round_trip(dithered_dir, tmp_path, with_mask):
+	png_path, bin_path = str(tmp_path / "sheet.png"), str(tmp_path / "sheet.bin")
+	pack_spritesheet(dithered_dir, png_path, 40, 30, 4)
+	metadata = pack_spritesheet(dithered_dir, bin_path, 40, 30, 4, sheet_format="1bit", mask=with_mask)
+
+	assert_same_pixels(png_path, bin_path, metadata["bitmap"], with_mask)
+
+def test_atlas_round_trip(dithered_dir, tmp_path):
+	png_path, bin_path = str(tmp_path / "atlas.png"), str(tmp_path / "atlas.bin")
+	png_meta = pack_atlas(dithered_dir, png_path, 40, 30)
+	bin_meta = pack_atlas(dithered_dir, bin_path, 40, 30, sheet_format="1bit")
+
+	assert png_meta["frames"] == bin_meta["frames"]
+	assert_same_pixels(png_path, bin_path, bin_meta["bitmap"])
+
+def test_metadata_names_do_not_collide():
+	assert metadata_path_for("out/index_sheet.png") == "out/index_sheet_metadata.json"
+	assert metadata_path_for("out/index_sheet.bin") == "out/index_sheet_bin_metadata.json"
+
+def test_switching_formats_keeps_each_metadata(dithered_dir, tmp_path, monkeypatch):
+	def pack(output, sheet_format):
+		monkeypatch.setattr(sys, "argv", ["pack_spritesheet.py", "--input", dithered_dir, "--output", output,
+			"--width", "40", "--height", "30", "--format", sheet_format])
+		pack_main()
+
+	png_path, bin_path = str(tmp_path / "index_sheet.png"), str(tmp_path / "index_sheet.bin")
+	pack(png_path, "png")
+	pack(bin_path, "1bit")
+	pack(png_path, "png")
+
+	with open(metadata_path_for(png_path)) as f:
+		png_meta = json.load(f)
+	with open(metadata_path_for(bin_path)) as f:
+		bin_meta = json.load(f)
+
+	assert png_meta["format"] == "png" and "bitmap" not in png_meta
+	assert bin_meta["format"] == "1bit" and os.path.getsize(bin_path) == sum(
+		plane["size"] for plane in bin_meta["bitmap"]["planes"].values())
@@ -0,0 +1,69 @@
+"""Blender sharding, exercised with tests/fake_blender.py instead of Blender"""
+import json
+import os
+
+from finger_config import FINGERS
+from run_pipeline import merge_shard_summaries, run_blender_export, shard_fingers
+
+FAKE_BLENDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_blender.py")
+
+def test_shards_balance_pose_counts():
+	fingers = {
+		"a": {"pose_count": 16},
+		"b": {"pose_count": 4},
+		"c": {"pose_count": 8},
+		"d": {"pose_count": 8},
+		"e": {"pose_count": 4},
+	}
+	shards = shard_fingers(fingers, 2)
+
+	assert sorted(sum(fingers[name]["pose_count"] for name in group) for group in shards) == [20, 20]
+	assert sorted(name for group in shards for name in group) == sorted(fingers)
+	# Each shard keeps the configured finger order
+	assert all(group == sorted(group) for group in shards)
+
+def test_shard_count_is_clamped():
+	assert shard_fingers(FINGERS, 0) == [list(FINGERS)]
+	assert len(shard_fingers(FINGERS, 100)) == len(FINGERS)
+
+def test_merge_marks_unreported_fingers_failed():
+	merged = merge_shard_summaries(
+		[["index"], ["thumb", "palm"]],
+		[(0, {"index": {"status": "success"}}, ""), (1, None, "loading\nSegmentation fault\n")]
+	)
+
+	assert list(merged) == ["palm", "thumb", "index"]
+	assert merged["index"] == {"status": "success"}
+	assert merged["thumb"] == {"status": "failed", "error": "Blender shard 1 exited with code 1: Segmentation fault"}
+
+def test_export_runs_every_shard(tmp_path, monkeypatch):
+	log = tmp_path / "shards.log"
+	monkeypatch.setenv("FAKE_BLENDER_LOG", str(log))
+
+	ok = run_blender_export("hand.blend", shards=3, blender=FAKE_BLENDER, dither=False, output_dir=str(tmp_path))
+
+	assert ok
+	with open(tmp_path / "export_summary.json") as f:
+		summary = json.load(f)
+	assert list(summary) == list(FINGERS)
+	assert all(entry["status"] == "success" and "--no-dither" in entry["flags"] for entry in summary.values())
+	assert len(log.read_text().splitlines()) == 3
+	assert sorted(os.listdir(tmp_path)) == ["export_summary.json", "shards.log"]
+
+def test_failing_shard_keeps_the_others(tmp_path, monkeypatch):
+	monkeypatch.setenv("FAKE_BLENDER_FAIL", "thumb")
+	groups = shard_fingers(FINGERS, 3)
+	crashed = next(group for group in groups if "thumb" in group)
+
+	ok = run_blender_export("hand.blend", shards=3, blender=FAKE_BLENDER, output_dir=str(tmp_path))
+
+	assert not ok
+	with open(tmp_path / "export_summary.json") as f:
+		summary = json.load(f)
+	assert list(summary) == list(FINGERS)
+	for name, entry in summary.items():
+		if name in crashed:
+			assert entry["status"] == "failed"
+			assert entry["error"].endswith("exited with code 3: Error: fake render crashed")
+		else:
+			assert entry["status"] == "success"
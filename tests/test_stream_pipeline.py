@@ -0,0 +1,94 @@
+"""In-process raw -> dither -> pack pipeline against the two-script path"""
+from PIL import Image
+import numpy as np
+import json
+import os
+import sys
+
+import pytest
+
+import dither
+import pack_spritesheet
+from build_cache import MANIFEST_NAME
+from stream_pipeline import process_finger, process_fingers
+
+FINGERS = ["thumb", "index", "middle", "ring"]
+
+def write_raw_frames(raw_dir, seed, count=5, size=(40, 30)):
+	os.makedirs(raw_dir, exist_ok=True)
+	rng = np.random.default_rng(seed)
+	w, h = size
+	for i in range(count):
+		rgba = rng.integers(0, 256, size=(h, w, 4), dtype=np.uint8)
+		rgba[:h // 4, :, 3] = 0    # a transparent band, so alpha handling is exercised too
+		Image.fromarray(rgba, mode="RGBA").save(os.path.join(raw_dir, f"f_{i:02d}.png"))
+	return str(raw_dir)
+
+def finger_jobs(tmp_path):
+	return {
+		name: {
+			"raw_dir":       write_raw_frames(tmp_path / "raw" / name, seed),
+			"output_path":   str(tmp_path / "sheets" / f"{name}_sheet.png"),
+			"sprite_width":  40,
+			"sprite_height": 30,
+		}
+		for seed, name in enumerate(FINGERS)
+	}
+
+def test_parallel_fingers_keep_every_cache_entry(tmp_path):
+	jobs = finger_jobs(tmp_path)
+
+	first = process_fingers(jobs, workers=4)
+	second = process_fingers(jobs, workers=4)
+
+	assert all(result["status"] == "success" for result in first.values())
+	assert all(result["status"] == "skipped" for result in second.values())
+	with open(tmp_path / "sheets" / MANIFEST_NAME) as f:
+		assert sorted(json.load(f)) == sorted(f"{name}_sheet.png" for name in FINGERS)
+
+def test_edited_frames_rebuild_only_their_finger(tmp_path):
+	jobs = finger_jobs(tmp_path)
+	process_fingers(jobs, workers=4)
+
+	write_raw_frames(jobs["middle"]["raw_dir"], seed=99)
+	results = process_fingers(jobs, workers=4)
+
+	assert {name: result["status"] for name, result in results.items()} == {
+		"thumb": "skipped", "index": "skipped", "middle": "success", "ring": "skipped"
+	}
+
+def run_script(monkeypatch, main, *args):
+	monkeypatch.setattr(sys, "argv", ["script.py", *args])
+	main()
+
+@pytest.mark.parametrize("sheet_format, layout, extension", [
+	("png", "grid", "png"),
+	("png", "atlas", "png"),
+	("1bit", "grid", "bin"),
+])
+def test_matches_dither_then_pack(tmp_path, monkeypatch, sheet_format, layout, extension):
+	raw_dir = write_raw_frames(tmp_path / "raw", seed=7, count=6)
+	dithered_dir = str(tmp_path / "dithered")
+	scripted = str(tmp_path / "scripted" / f"sheet.{extension}")
+	streamed = str(tmp_path / "streamed" / f"sheet.{extension}")
+	os.makedirs(os.path.dirname(scripted))
+
+	run_script(monkeypatch, dither.main, "--input", raw_dir, "--output", dithered_dir, "--jobs", "1")
+	run_script(monkeypatch, pack_spritesheet.main, "--input", dithered_dir, "--output", scripted,
+		"--width", "40", "--height", "30", "--format", sheet_format, "--layout", layout)
+
+	process_finger(raw_dir, streamed, sprite_width=40, sprite_height=30, sheet_format=sheet_format, layout=layout,
+		dithered_dir=str(tmp_path / "streamed_dithered"))
+
+	for path_a, path_b in [
+		(scripted, streamed),
+		(pack_spritesheet.metadata_path_for(scripted), pack_spritesheet.metadata_path_for(streamed)),
+	]:
+		with open(path_a, 'rb') as a, open(path_b, 'rb') as b:
+			assert a.read() == b.read(), os.path.basename(path_a)
+
+	for name in sorted(os.listdir(dithered_dir)):
+		if name.endswith(".png"):
+			with open(os.path.join(dithered_dir, name), 'rb') as a, \
+					open(tmp_path / "streamed_dithered" / name, 'rb') as b:
+				assert a.read() == b.read(), name
@@ -0,0 +1,38 @@
+"""Band-by-band dithering against dithering the whole frame at once"""
+from PIL import Image
+import numpy as np
+
+import pytest
+
+from dither import BAYER_4x4, dither_image
+from tiled_dither import dither_large_file
+
+def soft_frame(size=(60, 50)):
+	"""Noisy shading with a transparent border, so gray and alpha both vary across bands"""
+	rng = np.random.default_rng(3)
+	w, h = size
+	y, x = np.mgrid[0:h, 0:w]
+	rgba = np.zeros((h, w, 4), dtype=np.uint8)
+	rgba[..., :3] = np.clip(255 * x / w + rng.normal(0, 30, (h, w)), 0, 255)[..., None]
+	rgba[..., 2] = np.clip(255 * y / h, 0, 255)
+	rgba[..., 3] = 255
+	rgba[:4, :, 3] = 0
+	rgba[:, -6:, 3] = 0
+	return rgba
+
+@pytest.mark.parametrize("algorithm", ["ordered", "floyd-steinberg"])
+@pytest.mark.parametrize("extension", ["png", "npy"])
+def test_tiled_matches_whole_image(tmp_path, algorithm, extension):
+	rgba = soft_frame()
+	input_path = str(tmp_path / f"frame.{extension}")
+	if extension == "npy":
+		np.save(input_path, rgba)
+	else:
+		Image.fromarray(rgba, mode="RGBA").save(input_path)
+	output_path = str(tmp_path / "tiled.png")
+
+	# 7 doesn't divide 50, so the last band is short and the threshold map wraps mid-band
+	dither_large_file(input_path, output_path, BAYER_4x4, 10, 170, algorithm=algorithm, band_height=7)
+
+	expected = dither_image(Image.fromarray(rgba, mode="RGBA"), BAYER_4x4, 10, 170, algorithm)
+	assert np.array_equal(np.asarray(Image.open(output_path).convert("RGBA")), np.asarray(expected.convert("RGBA")))